@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# API_CACHE_BACKEND=memory (default) keeps entries in this process. API_CACHE_BACKEND=redis
+# shares them, and their invalidation, with other processes such as crawls run from the
+# command line; with the memory backend those only show up once API_CACHE_TTL expires.
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class MemoryBackend:
+    """LRU cache with a per-entry TTL. Thread-safe: the pipeline's writer thread invalidates it."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, generation):
+        with self._lock:
+            if generation != self._generation:
+                return  # Filled from data read before a clear
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Stores entries in Redis (or anything speaking its protocol) under a generation number.
+
+    Invalidation bumps the generation instead of deleting keys; stale entries
+    simply expire. A fill is stored under the generation it started in, so one
+    that overlaps an invalidation is never read.
+    """
+
+    def __init__(self, url, prefix="products-api"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("API_CACHE_BACKEND=redis needs the redis package: pip install redis") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def generation(self):
+        return int(self.client.get(f"{self.prefix}:generation") or 0)
+
+    def _key(self, key, generation):
+        return f"{self.prefix}:{generation}:{key}"
+
+    def get(self, key):
+        return self.client.get(self._key(key, self.generation()))
+
+    def set(self, key, value, ttl, generation):
+        self.client.set(self._key(key, generation), value, ex=max(1, int(ttl)))
+
+    def clear(self):
+        self.client.incr(f"{self.prefix}:generation")
+
+    def __len__(self):
+        generation = self.generation()
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}:{generation}:*"))
+
+
+class ResponseCache:
+    """Read-through cache of serialized API responses, keyed on path and query parameters.
+
+    Entries are dicts of JSON-compatible values, stored as JSON text so that
+    every backend holds the same thing. Take ``generation()`` before reading
+    the data an entry is built from and pass it to ``set``: an entry filled
+    across an invalidation is dropped rather than cached stale.
+    """
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()  # Guards the counters
+
+    @staticmethod
+    def key(path, params):
+        return path + "?" + "&".join(f"{name}={value}" for name, value in sorted(params))
+
+    def generation(self):
+        return self.backend.generation()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, entry, generation):
+        self.backend.set(key, json.dumps(entry), self.ttl, generation)
+
+    def invalidate(self):
+        self.backend.clear()
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            counters = {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+        return {"backend": type(self.backend).__name__, "entries": len(self.backend), **counters}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide ResponseCache, built from the API_CACHE_* environment variables."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if os.environ.get("API_CACHE_BACKEND", "memory") == "redis":
+                    backend = RedisBackend(os.environ.get("API_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+                else:
+                    backend = MemoryBackend(int(os.environ.get("API_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+                _cache = ResponseCache(backend, ttl=float(os.environ.get("API_CACHE_TTL", DEFAULT_TTL)))
+    return _cache
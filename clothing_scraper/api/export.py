@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from enum import StrEnum
+
+EXPORT_COLUMNS = ["id", "name", "description", "price", "sizes", "colors", "image_urls", "product_link", "scraped_at"]
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def ndjson_chunks(row_chunks):
+    """One JSON object per line, one string per chunk of rows."""
+    for rows in row_chunks:
+        yield "".join(json.dumps(row, default=_json_default, ensure_ascii=False) + "\n" for row in rows)
+
+def csv_chunks(row_chunks):
+    """A header line, then the rows; list columns are joined with '|'."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in row_chunks:
+        for row in rows:
+            writer.writerow([
+                "|".join(value) if isinstance(value, list) else value
+                for value in (row[column] for column in EXPORT_COLUMNS)
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Nothing was exported: still send the header
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,222 @@
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from api.cache import get_cache
+from database import db
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def run_crawl(job_id, spider_name):
+    """Worker process entry point: a fresh CrawlerProcess, and so a fresh reactor, per job."""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from clothing_scraper.registry import get_spider_class
+
+    settings = get_project_settings()
+    settings.set("SCRAPE_JOB_ID", job_id)
+    process = CrawlerProcess(settings)
+    process.crawl(get_spider_class(spider_name))
+    process.start()
+
+
+class JobRunner:
+    """Runs each crawl in its own worker process, at most ``max_concurrent`` at a time.
+
+    Jobs are rows in scrape_jobs. A monitor thread starts queued jobs as slots
+    free up and records how each process ended. The crawl itself keeps the
+    item/page counters current (see clothing_scraper.extensions.JobProgress).
+    Cancelling sends SIGTERM, which Scrapy handles as a graceful shutdown; a
+    crawl still alive ``cancel_grace`` seconds later is killed.
+    """
+
+    def __init__(self, max_concurrent=2, cancel_grace=30.0, poll_interval=1.0):
+        self.max_concurrent = max_concurrent
+        self.cancel_grace = cancel_grace
+        self.poll_interval = poll_interval
+        # spawn, not fork: the API process has threads and an event loop of its own
+        self.context = multiprocessing.get_context("spawn")
+        self.pending = collections.deque()  # (job_id, spider_name)
+        self.starting = {}  # job_id -> cancel requested, for jobs whose process is being started
+        self.running = {}  # job_id -> Process
+        self.kill_deadlines = {}  # job_id -> monotonic time, for jobs being cancelled
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="scrape-jobs", daemon=True)
+        self.thread.start()
+
+    def submit(self, spider_name):
+        job = db.create_scrape_job(spider_name)
+        with self.lock:
+            self.pending.append((job["id"], spider_name))
+        self.wakeup.set()
+        return job
+
+    def cancel(self, job_id):
+        """Returns False when the job isn't queued or running in this process."""
+        # Database writes happen outside the lock, which the monitor thread needs too
+        with self.lock:
+            queued = next((entry for entry in self.pending if entry[0] == job_id), None)
+            if queued is not None:
+                self.pending.remove(queued)
+            elif job_id in self.starting:
+                # _start_pending terminates it as soon as its process is up
+                self.starting[job_id] = True
+                return True
+            else:
+                process = self.running.get(job_id)
+                if process is None:
+                    return False
+                if job_id not in self.kill_deadlines:
+                    process.terminate()
+                    self.kill_deadlines[job_id] = time.monotonic() + self.cancel_grace
+        if queued is not None:
+            db.update_scrape_job(job_id, status=CANCELLED, finished_at=db.SQL_NOW)
+        else:
+            # The reaper may have recorded the exit already; never overwrite that
+            db.update_scrape_job(job_id, only_if_status=RUNNING, status=CANCELLING)
+        return True
+
+    def stop(self):
+        """Stops the monitor, cancelling queued jobs and terminating running ones. Blocking."""
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            pending = [job_id for job_id, _ in self.pending]
+            running = dict(self.running)
+            self.pending.clear()
+            self.running.clear()
+        for job_id in pending:
+            db.update_scrape_job(job_id, status=CANCELLED, finished_at=db.SQL_NOW)
+        # Every crawl gets the same grace period, running concurrently rather than one after another
+        for process in running.values():
+            process.terminate()
+        deadline = time.monotonic() + self.cancel_grace
+        for process in running.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+        for job_id, process in running.items():
+            if process.is_alive():
+                process.kill()
+                process.join()
+            db.update_scrape_job(
+                job_id, status=CANCELLED, error="API shut down", finished_at=db.SQL_NOW
+            )
+        if running:
+            self._invalidate_api_cache()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self._reap()
+                self._start_pending()
+            except Exception:
+                logger.exception("Scrape job monitor failed, retrying")
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+    def _start_pending(self):
+        # Slots are claimed under the lock; spawning and the database write happen outside it
+        to_start = []
+        with self.lock:
+            while self.pending and len(self.running) + len(self.starting) < self.max_concurrent:
+                job_id, spider_name = self.pending.popleft()
+                self.starting[job_id] = False
+                to_start.append((job_id, spider_name))
+        for job_id, spider_name in to_start:
+            try:
+                process = self.context.Process(
+                    target=run_crawl, args=(job_id, spider_name), name=f"scrape-job-{job_id}"
+                )
+                process.start()
+            except Exception as e:
+                with self.lock:
+                    del self.starting[job_id]
+                logger.exception(f"Scrape job {job_id} ({spider_name}) could not be started")
+                db.update_scrape_job(job_id, status=FAILED, error=f"Could not start: {e}", finished_at=db.SQL_NOW)
+                continue
+            db.update_scrape_job(job_id, status=RUNNING, pid=process.pid, started_at=db.SQL_NOW)
+            logger.info(f"Scrape job {job_id} ({spider_name}) started in process {process.pid}")
+            with self.lock:
+                cancel_requested = self.starting.pop(job_id)
+                self.running[job_id] = process
+                if cancel_requested:
+                    process.terminate()
+                    self.kill_deadlines[job_id] = time.monotonic() + self.cancel_grace
+            if cancel_requested:
+                db.update_scrape_job(job_id, only_if_status=RUNNING, status=CANCELLING)
+
+    def _reap(self):
+        exited = []
+        with self.lock:
+            for job_id, process in list(self.running.items()):
+                if process.is_alive():
+                    deadline = self.kill_deadlines.get(job_id)
+                    if deadline is not None and time.monotonic() > deadline:
+                        logger.warning(f"Scrape job {job_id} ignored SIGTERM, killing it")
+                        process.kill()
+                    continue
+                process.join()
+                del self.running[job_id]
+                cancelled = self.kill_deadlines.pop(job_id, None) is not None
+                exited.append((job_id, process.exitcode, cancelled))
+        for job_id, exitcode, cancelled in exited:
+            self._record_exit(job_id, exitcode, cancelled)
+
+    def _record_exit(self, job_id, exitcode, cancelled):
+        fields = {"finished_at": db.SQL_NOW}
+        if cancelled:
+            fields["status"] = CANCELLED
+        elif exitcode:
+            fields.update(status=FAILED, error=f"Crawl process exited with code {exitcode}")
+        else:
+            job = db.get_scrape_job(job_id)
+            if job and job["finish_reason"]:
+                fields["status"] = FINISHED
+            else:
+                fields.update(status=FAILED, error="Crawl process exited without closing its spider")
+        db.update_scrape_job(job_id, **fields)
+        logger.info(f"Scrape job {job_id} {fields['status']} (exit code {exitcode})")
+        # The crawl's pipeline only invalidated its own process's cache
+        self._invalidate_api_cache()
+
+    def _invalidate_api_cache(self):
+        try:
+            get_cache().invalidate()
+        except Exception as e:
+            logger.warning(f"Could not invalidate the API response cache: {e}")
+
+
+_runner = None
+
+
+def get_runner():
+    """The API process's JobRunner, sized by the ``jobs`` section of config.yaml.
+
+    SCRAPE_MAX_CONCURRENT_JOBS overrides the concurrency cap.
+    """
+    global _runner
+    if _runner is None:
+        jobs_config = db.load_config().get("jobs", {})
+        _runner = JobRunner(
+            max_concurrent=int(os.environ.get("SCRAPE_MAX_CONCURRENT_JOBS", jobs_config.get("max_concurrent", 2))),
+            cancel_grace=float(jobs_config.get("cancel_grace_seconds", 30)),
+        )
+    return _runner
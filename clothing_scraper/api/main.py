@@ -1,79 +1,237 @@
+import hashlib
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
+import psycopg2
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from api.cache import get_cache
+from api.export import EXPORT_COLUMNS, MEDIA_TYPES, ExportFormat, csv_chunks, ndjson_chunks
+from api.jobs import get_runner
 from api.models import (
+    BulkResult,
     DeleteProductResponse,
+    ProductBulkUpdate,
     ProductCreate,
     ProductResponse,
+    ProductSearchResult,
     ProductUpdate,
+    ScrapeJobResponse,
 )
+from api.pagination import decode_cursor, encode_cursor
 from api.spiders import SpiderName
-from clothing_scraper.spiders.bershka import BershkaSpider
-from clothing_scraper.spiders.canda import CandaSpider
-from clothing_scraper.spiders.celio import CelioSpider
-from clothing_scraper.spiders.nike import NikeSpider
-from clothing_scraper.spiders.pullandbear import PullandbearSpider
+from clothing_scraper import registry
 from database import db
 
 app = FastAPI()
-executor = ThreadPoolExecutor(max_workers=2)  # Adjust max_workers as needed
+product_adapter = TypeAdapter(ProductResponse)
+product_list_adapter = TypeAdapter(List[ProductResponse])
+BULK_MAX_ROWS = int(os.environ.get("API_BULK_MAX_ROWS", db.load_config().get("api", {}).get("bulk_max_rows", 10000)))
+job_runner = get_runner()
 
 
-def run_spider_in_thread(spider_name: SpiderName):
-    settings = get_project_settings()
-    process = CrawlerProcess(settings)
+@app.on_event("startup")
+def start_job_runner():
+    # Crawl processes don't outlive the API process that started them
+    db.fail_unfinished_scrape_jobs("Interrupted: the API restarted before the job finished")
+    job_runner.start()
+
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.stop()
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    db.close_pool()
+
+
+def _cached_json(request: Request, produce):
+    """Serves a GET from the response cache, calling ``produce()`` -> (json body, headers) on a miss.
+
+    Responses carry an ETag; a matching If-None-Match gets an empty 304.
+    """
+    cache = get_cache()
+    key = cache.key(request.url.path, request.query_params.multi_items())
+    # Taken before reading the database, so a write landing during produce() voids this fill
+    generation = cache.generation()
+    entry = cache.get(key)
+    status = "HIT"
+    if entry is None:
+        status = "MISS"
+        body, headers = produce()
+        entry = {"body": body, "headers": headers, "etag": f'"{hashlib.sha1(body.encode()).hexdigest()}"'}
+        cache.set(key, entry, generation)
+
+    headers = {**entry["headers"], "ETag": entry["etag"], "X-Cache": status}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or entry["etag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
 
-    spider_map = {
-        SpiderName.PULLANDBEAR: PullandbearSpider,
-        SpiderName.CANDA: CandaSpider,
-        SpiderName.NIKE: NikeSpider,
-        SpiderName.BERSHKA: BershkaSpider,
-        SpiderName.CELIO: CelioSpider,
-    }
 
-    spider_cls = spider_map.get(spider_name)
-    if not spider_cls:
-        raise ValueError(f"Spider '{spider_name}' not found.")
+@app.get("/cache/stats")
+def cache_stats():
+    return get_cache().stats()
 
-    process.crawl(spider_cls)
-    process.start(stop_after_crawl=True)  # Blocks until crawl finishes
 
+@app.post("/scrape/{spider_name}", response_model=ScrapeJobResponse, status_code=202)
+def scrape_products(spider_name: SpiderName):
+    if not registry.is_registered(spider_name):
+        raise HTTPException(status_code=404, detail=f"No spider is registered for '{spider_name}'")
+    return job_runner.submit(spider_name)
 
-@app.post("/scrape/{spider_name}")
-async def scrape_products(spider_name: SpiderName):
-    # Submit the blocking spider run to the thread pool
-    executor.submit(run_spider_in_thread, spider_name)
 
-    return {"message": f"Scraping for {spider_name} started in background."}
+@app.get("/scrape/jobs/{job_id}", response_model=ScrapeJobResponse)
+def read_scrape_job(job_id: int):
+    job = db.get_scrape_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return job
+
+
+@app.post("/scrape/jobs/{job_id}/cancel", response_model=ScrapeJobResponse)
+def cancel_scrape_job(job_id: int):
+    if db.get_scrape_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    if not job_runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Scrape job is not queued or running")
+    return db.get_scrape_job(job_id)
 
 
 @app.post("/products/", response_model=ProductResponse)
 def create_product(product: ProductCreate):
     db_product = db.create_product(product.model_dump())
+    get_cache().invalidate()
     return db_product
 
 
+def _split_list(value: Optional[str]):
+    """sizes=M,L -> ["M", "L"]"""
+    if not value:
+        return None
+    return [part.strip() for part in value.split(",") if part.strip()] or None
+
+
+def _dump_products(products):
+    # Rows are validated into ProductResponse first: dumping psycopg2 rows directly bypasses the
+    # response model, so neither its fields nor its exclusion of internal columns would apply
+    return product_list_adapter.dump_json(product_list_adapter.validate_python(products)).decode()
+
+
 @app.get("/products/", response_model=List[ProductResponse])
-def read_products(skip: int = 0, limit: int = 100):
-    products = db.get_products(skip=skip, limit=limit)
-    return products
+def read_products(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[str] = Query(None, description="Comma-separated; products must have all of them"),
+    colors: Optional[str] = Query(None, description="Comma-separated; products must have all of them"),
+):
+    filters = {
+        "min_price": min_price,
+        "max_price": max_price,
+        "sizes": _split_list(sizes),
+        "colors": _split_list(colors),
+    }
+
+    def produce():
+        if cursor is None:
+            products = db.get_products(skip=skip, limit=limit, **filters)
+            return _dump_products(products), {}
+
+        # Keyset mode, newest first: pass cursor= (empty) for the first page, then the
+        # X-Next-Cursor header of each response; no header means there are no more pages
+        after_scraped_at, after_id = None, None
+        if cursor:
+            try:
+                after_scraped_at, after_id = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        products = db.get_products_page(after_scraped_at=after_scraped_at, after_id=after_id, limit=limit, **filters)
+        headers = {"X-Next-Cursor": encode_cursor(products[-1])} if len(products) == limit else {}
+        return _dump_products(products), headers
+
+    return _cached_json(request, produce)
+
+
+@app.get("/products/search", response_model=List[ProductSearchResult])
+def search_products(q: str = Query(..., min_length=2), skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=100)):
+    return db.search_products(q, skip=skip, limit=limit)
+
+
+@app.get("/products/export")
+def export_products(format: ExportFormat = ExportFormat.NDJSON, chunk_size: int = Query(1000, ge=1, le=10000)):
+    # Declared (like /search and /bulk) before /products/{product_id} so "export" isn't taken for an id
+    row_chunks = db.iter_products(EXPORT_COLUMNS, chunk_size=chunk_size)
+    body = csv_chunks(row_chunks) if format == ExportFormat.CSV else ndjson_chunks(row_chunks)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+def _check_bulk_size(rows):
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per bulk request")
+
+
+@app.post("/products/bulk", response_model=List[BulkResult])
+def create_products_bulk(products: List[ProductCreate]):
+    _check_bulk_size(products)
+    ids = db.create_products([product.model_dump() for product in products])
+    get_cache().invalidate()
+    return [
+        {"index": index, "id": product_id, "status": "created" if product_id is not None else "conflict"}
+        for index, product_id in enumerate(ids)
+    ]
+
+
+@app.put("/products/bulk", response_model=List[BulkResult])
+def update_products_bulk(products: List[ProductBulkUpdate]):
+    _check_bulk_size(products)
+    try:
+        updated = db.update_products([product.model_dump(exclude_unset=True) for product in products])
+    except psycopg2.IntegrityError as e:
+        # Everything runs in one transaction, so nothing was applied
+        raise HTTPException(status_code=409, detail=str(e).strip())
+    get_cache().invalidate()
+    return [
+        {"index": index, "id": product.id, "status": "updated" if product.id in updated else "not_found"}
+        for index, product in enumerate(products)
+    ]
+
+
+@app.delete("/products/bulk", response_model=List[BulkResult])
+def delete_products_bulk(product_ids: List[int]):
+    _check_bulk_size(product_ids)
+    deleted = db.delete_products(product_ids)
+    get_cache().invalidate()
+    return [
+        {"index": index, "id": product_id, "status": "deleted" if product_id in deleted else "not_found"}
+        for index, product_id in enumerate(product_ids)
+    ]
 
 
 @app.get("/products/{product_id}", response_model=ProductResponse)
-def read_product(product_id: int):
-    product = db.get_product(product_id)
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+def read_product(request: Request, product_id: int):
+    def produce():
+        product = db.get_product(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product_adapter.dump_json(product_adapter.validate_python(product)).decode(), {}
+
+    return _cached_json(request, produce)
 
 
 @app.put("/products/{product_id}", response_model=ProductResponse)
@@ -81,6 +239,7 @@ def update_product(product_id: int, product: ProductUpdate):
     updated_id = db.update_product(product_id, product.model_dump(exclude_unset=True))
     if updated_id is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    get_cache().invalidate()
     return db.get_product(updated_id)
 
 
@@ -89,10 +248,12 @@ def delete_product(product_id: int):
     deleted_id = db.delete_product(product_id)
     if deleted_id is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    get_cache().invalidate()
     return {"id": deleted_id, "message": "Product deleted successfully"}
 
 
 @app.delete("/products/")
 def delete_all_products():
     db.delete_all_products()
+    get_cache().invalidate()
     return {"message": "All products deleted successfully"}
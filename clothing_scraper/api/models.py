@@ -17,6 +17,9 @@ class ProductCreate(ProductBase):
 class ProductUpdate(ProductBase):
     pass
 
+class ProductBulkUpdate(ProductUpdate):
+    id: int
+
 class ProductResponse(ProductBase):
     id: int
     scraped_at: datetime
@@ -24,6 +27,28 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True # Allow ORM mode
 
+class ProductSearchResult(ProductResponse):
+    rank: float
+
 class DeleteProductResponse(BaseModel):
     id: int
-    message: str
\ No newline at end of file
+    message: str
+
+class BulkResult(BaseModel):
+    index: int  # Position in the request array
+    id: Optional[int] = None
+    status: str  # created, updated, deleted, conflict or not_found
+
+class ScrapeJobResponse(BaseModel):
+    id: int
+    spider: str
+    status: str  # queued, running, cancelling, finished, failed or cancelled
+    pid: Optional[int] = None
+    items_scraped: int
+    pages_crawled: int
+    finish_reason: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime
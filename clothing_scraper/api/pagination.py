@@ -0,0 +1,21 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(row) -> str:
+    """Opaque cursor pointing just past ``row`` in (scraped_at, id) order. scraped_at may be NULL."""
+    scraped_at = row["scraped_at"]
+    payload = {"after_scraped_at": scraped_at.isoformat() if scraped_at is not None else None, "after_id": row["id"]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Returns (after_scraped_at, after_id), after_scraped_at possibly None; raises ValueError for anything that isn't ours."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        scraped_at = payload["after_scraped_at"]
+        return (datetime.fromisoformat(scraped_at) if scraped_at is not None else None), int(payload["after_id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,76 @@
+"""Compares per-element CDP extraction with the batched extract_cards helper.
+
+Renders a synthetic listing page with N product cards in headless Chromium and
+times both approaches on it:
+
+    python benchmarks/extraction_benchmark.py --cards 200 --runs 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from pyppeteer import launch
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from clothing_scraper.extraction import extract_cards
+from clothing_scraper.spiders.nike import NikeSpider
+
+CARD_HTML = """
+<div class="product-card">
+  <a class="product-card__link-overlay" href="/fr/t/produit-{i}">Produit {i}</a>
+  <div class="product-card__title">Produit {i}</div>
+  <img class="product-card__hero-image" src="https://example.com/img/{i}.jpg">
+  <div class="product-price is--current-price">{i},99 €</div>
+</div>
+"""
+
+
+async def extract_per_element(page, selector):
+    # What the spiders did before: several awaited DevTools calls per field per card
+    rows = []
+    for card in await page.querySelectorAll(selector):
+        row = {}
+        for key, spec in NikeSpider.card_fields.items():
+            element = await card.querySelector(spec["selector"])
+            row[key] = await (await element.getProperty(spec["prop"])).jsonValue() if element else None
+        rows.append(row)
+    return rows
+
+
+async def time_it(coro_factory, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await coro_factory()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def main(cards, runs):
+    browser = await launch(args=['--no-sandbox', '--disable-setuid-sandbox'])
+    try:
+        page = await browser.newPage()
+        await page.setContent("".join(CARD_HTML.format(i=i) for i in range(cards)))
+
+        per_element = await time_it(lambda: extract_per_element(page, ".product-card"), runs)
+        batched = await time_it(lambda: extract_cards(page, ".product-card", NikeSpider.card_fields), runs)
+    finally:
+        await browser.close()
+
+    print(f"{cards} cards, {runs} runs (median)")
+    print(f"  per-element: {statistics.median(per_element) * 1000:8.1f} ms")
+    print(f"  batched:     {statistics.median(batched) * 1000:8.1f} ms")
+    print(f"  speed-up:    {statistics.median(per_element) / statistics.median(batched):8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.cards, args.runs))
@@ -0,0 +1,94 @@
+"""Compares OFFSET and keyset pagination latency at increasing page depths.
+
+Builds an unlogged copy of the products table (same columns and indexes)
+filled with synthetic rows, then times one page at each depth with both
+queries used by GET /products/:
+
+    python benchmarks/pagination_benchmark.py --rows 1000000 --page-size 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from database.db import get_connection
+
+TABLE = "products_bench"
+
+
+def build_table(cur, rows):
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+    cur.execute(f"CREATE UNLOGGED TABLE {TABLE} (LIKE products INCLUDING ALL);")
+    cur.execute(
+        f"""
+        INSERT INTO {TABLE} (id, name, price, sizes, colors, image_urls, product_link, scraped_at)
+        SELECT i, 'Produit ' || i, (i % 100) + 0.99, ARRAY['S', 'M', 'L'], ARRAY['noir'],
+               ARRAY['https://example.com/' || i || '.jpg'], 'https://example.com/p/' || i,
+               now() - (i % 50000) * interval '1 second'
+        FROM generate_series(1, %s) AS i;
+        """,
+        (rows,),
+    )
+    cur.execute(f"ANALYZE {TABLE};")
+
+
+def timed(cur, sql, params, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main(rows, page_size, runs, keep):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        print(f"Building {TABLE} with {rows} rows...")
+        build_table(cur, rows)
+        conn.commit()
+
+        depths = [d for d in (0, 1_000, 10_000, 100_000, 500_000, rows - page_size) if d <= rows - page_size]
+        print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+        for depth in depths:
+            offset_ms = timed(
+                cur, f"SELECT * FROM {TABLE} ORDER BY id OFFSET %s LIMIT %s;", (depth, page_size), runs
+            )
+            # The cursor a client would hold after reading `depth` rows
+            cur.execute(
+                f"SELECT scraped_at, id FROM {TABLE} ORDER BY scraped_at DESC, id DESC OFFSET %s LIMIT 1;",
+                (max(depth - 1, 0),),
+            )
+            after_scraped_at, after_id = cur.fetchone()
+            keyset_ms = timed(
+                cur,
+                f"""
+                SELECT * FROM {TABLE}
+                WHERE (scraped_at, id) < (%s, %s)
+                ORDER BY scraped_at DESC, id DESC
+                LIMIT %s;
+                """,
+                (after_scraped_at, after_id, page_size),
+                runs,
+            )
+            print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+        if not keep:
+            cur.execute(f"DROP TABLE {TABLE};")
+            conn.commit()
+        cur.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark table afterwards")
+    args = parser.parse_args()
+    main(args.rows, args.page_size, args.runs, args.keep)
@@ -0,0 +1,97 @@
+"""Measures GET /products/search query latency on a large synthetic catalog.
+
+Builds an unlogged copy of the products table (same columns, generated
+search column and indexes) filled with random French product names, then
+runs the search query for a mix of exact, multi-word and misspelled terms:
+
+    python benchmarks/search_benchmark.py --rows 1000000 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from database.db import SEARCH_PRODUCTS_SQL, get_connection
+
+TABLE = "products_search_bench"
+
+KINDS = ["chemise", "pantalon", "veste", "robe", "jean", "pull", "t-shirt", "blouson", "short", "sweat"]
+QUALIFIERS = ["en lin", "en coton", "oversize", "slim", "à rayures", "à capuche", "imprimé", "côtelé", "droit", "court"]
+COLORS = ["noir", "blanc", "bleu marine", "écru", "kaki", "bordeaux", "gris chiné", "camel", "vert", "rose"]
+
+QUERIES = [
+    "chemise",
+    "chemise lin",
+    "veste en coton noir",
+    "pantalons côtelés",
+    "chmise",  # Typo, only the trigram side can match
+    "blousn kaki",
+    "sweat à capuche gris",
+    "robe imprimée",
+]
+
+
+def build_table(cur, rows):
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+    cur.execute(f"CREATE UNLOGGED TABLE {TABLE} (LIKE products INCLUDING ALL);")
+    cur.execute(
+        f"""
+        INSERT INTO {TABLE} (id, name, description, price, product_link)
+        SELECT i,
+               initcap((%(kinds)s::text[])[1 + (i * 7) %% 10]) || ' '
+                   || (%(qualifiers)s::text[])[1 + (i * 13) %% 10] || ' '
+                   || (%(colors)s::text[])[1 + (i * 17) %% 10],
+               'Coupe ' || (%(qualifiers)s::text[])[1 + (i * 3) %% 10] || ', modèle ' || i,
+               (i %% 100) + 0.99,
+               'https://example.com/p/' || i
+        FROM generate_series(1, %(rows)s) AS i;
+        """,
+        {"kinds": KINDS, "qualifiers": QUALIFIERS, "colors": COLORS, "rows": rows},
+    )
+    cur.execute(f"ANALYZE {TABLE};")
+
+
+def percentile(timings, p):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main(rows, runs, limit, keep):
+    sql = SEARCH_PRODUCTS_SQL.replace("FROM products,", f"FROM {TABLE},")
+    with get_connection() as conn:
+        cur = conn.cursor()
+        print(f"Building {TABLE} with {rows} rows...")
+        build_table(cur, rows)
+        conn.commit()
+
+        all_timings = []
+        print(f"{'query':<24} {'hits':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        for q in QUERIES:
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                cur.execute(sql, {"q": q, "skip": 0, "limit": limit})
+                hits = len(cur.fetchall())
+                timings.append((time.perf_counter() - started) * 1000)
+            all_timings.extend(timings)
+            print(f"{q:<24} {hits:>6} {statistics.median(timings):>8.2f} {percentile(timings, 95):>8.2f}")
+        print(f"{'all queries':<24} {'':>6} {statistics.median(all_timings):>8.2f} {percentile(all_timings, 95):>8.2f}")
+
+        if not keep:
+            cur.execute(f"DROP TABLE {TABLE};")
+            conn.commit()
+        cur.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark table afterwards")
+    args = parser.parse_args()
+    main(args.rows, args.runs, args.limit, args.keep)
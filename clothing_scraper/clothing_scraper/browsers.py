@@ -0,0 +1,133 @@
+import asyncio
+import logging
+
+from pyppeteer import launch
+
+from clothing_scraper.page_pool import PagePool
+
+logger = logging.getLogger(__name__)
+
+# Shard lists shared by the crawlers of one process, keyed by their launch settings: [shards, users]
+_shared_shards = {}
+
+
+class BrowserShard:
+    """One Chromium instance with its own page pool, health tracking and restart policy."""
+
+    def __init__(self, index, launch_options, page_pool_size, stats=None, max_failures=3, max_restarts=5):
+        self.index = index
+        self.launch_options = launch_options
+        self.page_pool_size = page_pool_size
+        self.stats = stats
+        self.max_failures = max_failures
+        self.max_restarts = max_restarts
+        self.browser = None
+        self.page_pool = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.restarts = 0
+        # Bumped whenever the browser is dropped; leases carry it so failures of an old browser aren't charged to a new one
+        self.generation = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def retired(self):
+        """A shard that keeps failing after max_restarts stops receiving requests."""
+        return self.restarts > self.max_restarts
+
+    def _inc(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f'pyppeteer/browser/{self.index}/{key}', count)
+
+    async def ensure_launched(self):
+        async with self._lock:
+            if self.browser is not None:
+                return
+            logger.info(f"Launching Pyppeteer browser #{self.index}...")
+            self.browser = await launch(handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False, **self.launch_options)
+            self.browser.on('disconnected', self._on_disconnected)
+            self.page_pool = PagePool(self.browser, self.page_pool_size, stats=self.stats)
+            self.consecutive_failures = 0
+            logger.info(f"Pyppeteer browser #{self.index} launched with a pool of {self.page_pool_size} pages.")
+
+    def _on_disconnected(self, *args):
+        # Chromium crashed or was killed: drop it so the next lease relaunches
+        logger.warning(f"Pyppeteer browser #{self.index} disconnected.")
+        self.browser = None
+        self.page_pool = None
+        self.generation += 1
+        self.restarts += 1
+        self._inc('restarts')
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._inc('requests')
+
+    async def record_failure(self, generation):
+        """Counts a failed lease taken at ``generation``; failures of an already replaced browser are ignored."""
+        self._inc('failures')
+        if generation != self.generation:
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.max_failures:
+            logger.warning(
+                f"Pyppeteer browser #{self.index} failed {self.consecutive_failures} requests in a row, restarting."
+            )
+            await self.restart()
+
+    async def restart(self):
+        # Bump before awaiting, so the failures of this browser still in flight become stale
+        self.generation += 1
+        self.consecutive_failures = 0
+        await self.close()
+        self.restarts += 1
+        self._inc('restarts')
+        if self.retired:
+            logger.error(f"Pyppeteer browser #{self.index} exceeded {self.max_restarts} restarts, retiring it.")
+
+    async def close(self):
+        async with self._lock:
+            browser, page_pool = self.browser, self.page_pool
+            self.browser = None
+            self.page_pool = None
+            if browser is None:
+                return
+            browser.remove_listener('disconnected', self._on_disconnected)
+            logger.info(f"Closing Pyppeteer browser #{self.index}...")
+            await page_pool.close()
+            await browser.close()
+            logger.info(f"Pyppeteer browser #{self.index} closed.")
+
+
+def pick_least_loaded(shards):
+    """Routes to the live shard with the fewest requests in flight."""
+    candidates = [shard for shard in shards if not shard.retired]
+    if not candidates:
+        raise RuntimeError("All Pyppeteer browsers have been retired after repeated failures")
+    return min(candidates, key=lambda shard: (shard.in_flight, shard.index))
+
+
+def acquire_shared_shards(key, create):
+    """Returns the shards registered under ``key``, building them with ``create()`` for the first user.
+
+    Crawlers running side by side in one CrawlerProcess pass the same key when
+    their browser settings match, and so drive the same browsers. Everything
+    here runs on the reactor thread.
+    """
+    entry = _shared_shards.get(key)
+    if entry is None:
+        entry = _shared_shards[key] = [create(), 0]
+    entry[1] += 1
+    return entry[0]
+
+
+def release_shared_shards(key):
+    """Drops one user of ``key``; returns its shards once nobody uses them, for the caller to close."""
+    entry = _shared_shards.get(key)
+    if entry is None:
+        return []
+    entry[1] -= 1
+    if entry[1] > 0:
+        return []
+    del _shared_shards[key]
+    return entry[0]
@@ -0,0 +1,293 @@
+import logging
+import queue
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Existing rows are only rewritten when their content hash changed; xmax = 0 tells
+# freshly inserted rows apart from updated ones, unchanged rows return nothing.
+# scraped_at keeps the first time a product was seen: GET /products/ pages on
+# (scraped_at, id), and moving it forward would reorder rows under an open cursor.
+# product_fingerprints.last_changed_at records the latest change instead.
+UPSERT_PRODUCTS_SQL = """
+    INSERT INTO products (name, description, price, sizes, colors, image_urls, product_link, content_hash)
+    VALUES %s
+    ON CONFLICT (product_link) DO UPDATE SET
+        name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        price = EXCLUDED.price,
+        sizes = EXCLUDED.sizes,
+        colors = EXCLUDED.colors,
+        image_urls = EXCLUDED.image_urls,
+        content_hash = EXCLUDED.content_hash
+    WHERE products.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+    RETURNING product_link, (xmax = 0) AS inserted;
+"""
+
+# Refreshes what DeltaCrawlMiddleware knows about each product written
+UPSERT_FINGERPRINTS_SQL = """
+    INSERT INTO product_fingerprints (product_link, content_hash, category_url, last_seen_at, last_changed_at)
+    VALUES %s
+    ON CONFLICT (product_link) DO UPDATE SET
+        last_seen_at = EXCLUDED.last_seen_at,
+        last_changed_at = CASE
+            WHEN product_fingerprints.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            THEN EXCLUDED.last_changed_at
+            ELSE product_fingerprints.last_changed_at
+        END,
+        content_hash = EXCLUDED.content_hash,
+        category_url = COALESCE(EXCLUDED.category_url, product_fingerprints.category_url);
+"""
+
+# Rows are (name, description, price, sizes, colors, image_urls, product_link, content_hash, category_url, stats).
+# stats is the collector of the crawler the row came from, so that a writer shared by
+# several crawlers still counts each row's outcome against its own crawler
+PRODUCT_LINK_INDEX = 6
+CONTENT_HASH_INDEX = 7
+CATEGORY_URL_INDEX = 8
+STATS_INDEX = 9
+
+# Writers shared by the pipelines of crawlers in one process, keyed by DSN and batching: [writer, users]
+_shared_writers = {}
+_shared_writers_lock = threading.Lock()
+
+
+def _call_on_reactor(func, *args):
+    # The stats collector isn't thread-safe. Imported here rather than at the top so that
+    # importing this module never installs a reactor ahead of Scrapy's choice
+    from twisted.internet import reactor
+
+    reactor.callFromThread(func, *args)
+
+
+class DatabaseWriter(threading.Thread):
+    """Drains product rows from a bounded queue and writes them in batches on its own thread.
+
+    psycopg2 blocks, so keeping it here lets the reactor carry on driving
+    pages while a commit is in flight. ``put`` blocks when the queue is full,
+    which is how the pipeline applies backpressure to the crawl. Should the
+    thread die, queued rows are dropped and ``put`` raises RuntimeError.
+    Stats are recorded on the reactor thread.
+    """
+
+    # How long put and close wait on a full queue before checking the thread is still alive
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, conn, batch_size=500, flush_interval=5.0, queue_size=5000, stats=None, on_flush=None):
+        super().__init__(name="db-writer", daemon=True)
+        self.conn = conn
+        self.on_flush = on_flush  # Called on this thread as on_flush(inserted, changed) after each commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = stats
+        self.rows = queue.Queue(maxsize=queue_size)
+        self.error = None  # Set when run() dies
+        self.rows_written = 0
+        self.write_time = 0.0
+        self.inserted = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def _check_alive(self):
+        if self.error is not None:
+            raise RuntimeError(f"Database writer died: {self.error!r}")
+
+    def put(self, row, block=True):
+        self._check_alive()
+        if not block:
+            self.rows.put(row, block=False)
+            return
+        while True:
+            try:
+                self.rows.put(row, timeout=self.POLL_INTERVAL)
+                break
+            except queue.Full:
+                self._check_alive()
+        # The thread may have died, and dropped the queue, while this row went in
+        self._check_alive()
+
+    def close(self):
+        """Flushes whatever is queued and waits for the thread to finish. Blocking."""
+        while self.is_alive():
+            try:
+                self.rows.put(_STOP, timeout=self.POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        self.join()
+
+    def run(self):
+        batch = []
+        try:
+            self._run(batch)
+        except Exception as e:
+            self.error = e
+            logger.exception("Database writer died, dropping every queued row")
+            self._inc_rows("db/rows_failed", batch + self._drain())
+            self._inc("db/writer_died")
+
+    def _run(self, batch):
+        cur = self.conn.cursor()
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    row = self.rows.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    row = None
+                if row is _STOP:
+                    break
+                if row is not None:
+                    batch.append(row)
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    self._flush(cur, batch)
+                    batch.clear()
+                    deadline = time.monotonic() + self.flush_interval
+            self._flush(cur, batch)
+            batch.clear()
+        finally:
+            cur.close()
+
+    def _drain(self):
+        """Empties the queue, unblocking puts waiting on it; returns the rows dropped."""
+        dropped = []
+        while True:
+            try:
+                row = self.rows.get_nowait()
+            except queue.Empty:
+                return dropped
+            if row is not _STOP:
+                dropped.append(row)
+
+    def _flush(self, cur, rows):
+        if not rows:
+            return
+        # One statement can't upsert the same product twice; keep the last copy
+        unique = list({row[PRODUCT_LINK_INDEX]: row for row in rows}.values())
+        if len(unique) < len(rows):
+            self._inc("db/duplicates_in_batch", len(rows) - len(unique))
+            rows = unique
+        started = time.monotonic()
+        try:
+            returned = self._write(cur, rows)
+        except psycopg2.Error as e:
+            if self.conn.closed:
+                logger.error(f"Database connection lost, dropped a batch of {len(rows)} rows: {e}")
+                self._inc_rows("db/rows_failed", rows)
+                return
+            self.conn.rollback()
+            # One bad row fails the whole statement; write the rows one by one to keep the others
+            logger.warning(f"Database error on a batch of {len(rows)} rows, retrying them one at a time: {e}")
+            self._inc("db/batch_retries")
+            rows, returned = self._write_singly(cur, rows)
+            if not rows:
+                return
+        latency = time.monotonic() - started
+
+        outcomes = {link: "db/inserted" if was_inserted else "db/changed" for link, was_inserted in returned}
+        by_outcome = {"db/inserted": [], "db/changed": [], "db/unchanged": []}
+        for row in rows:
+            by_outcome[outcomes.get(row[PRODUCT_LINK_INDEX], "db/unchanged")].append(row)
+        inserted = len(by_outcome["db/inserted"])
+        changed = len(by_outcome["db/changed"])
+        self.inserted += inserted
+        self.changed += changed
+        self.unchanged += len(by_outcome["db/unchanged"])
+        for key, outcome_rows in by_outcome.items():
+            self._inc_rows(key, outcome_rows, rows)
+        if self.on_flush is not None:
+            try:
+                self.on_flush(inserted, changed)
+            except Exception as e:
+                logger.warning(f"on_flush callback failed: {e}")
+
+        # Unchanged rows were matched but not rewritten
+        self.rows_written += inserted + changed
+        self.write_time += latency
+        self._inc_rows("db/rows_written", by_outcome["db/inserted"] + by_outcome["db/changed"], rows)
+        # Batch-level figures belong to no one crawler; they go to the writer's own stats
+        self._inc("db/flushes")
+        self._inc("db/flush_time", latency)
+        if self.stats is not None:
+            _call_on_reactor(self.stats.max_value, "db/max_flush_latency", latency)
+            _call_on_reactor(self.stats.set_value, "db/rows_per_second", self.rows_written / self.write_time)
+
+    def _write(self, cur, rows):
+        """Upserts rows and their fingerprints in one transaction; returns the products upsert's rows."""
+        returned = execute_values(
+            cur, UPSERT_PRODUCTS_SQL, [row[:CATEGORY_URL_INDEX] for row in rows], page_size=len(rows), fetch=True
+        )
+        execute_values(
+            cur,
+            UPSERT_FINGERPRINTS_SQL,
+            [(row[PRODUCT_LINK_INDEX], row[CONTENT_HASH_INDEX], row[CATEGORY_URL_INDEX]) for row in rows],
+            template="(%s, %s, %s, now(), now())",
+            page_size=len(rows),
+        )
+        self.conn.commit()
+        return returned
+
+    def _write_singly(self, cur, rows):
+        """Writes each row in its own transaction, dropping the ones the database rejects."""
+        written, returned = [], []
+        for index, row in enumerate(rows):
+            try:
+                returned.extend(self._write(cur, [row]))
+            except psycopg2.Error as e:
+                if self.conn.closed:
+                    logger.error(f"Database connection lost, dropped {len(rows) - index} rows: {e}")
+                    self._inc_rows("db/rows_failed", rows[index:])
+                    break
+                self.conn.rollback()
+                logger.error(f"Database error, dropped the row for {row[PRODUCT_LINK_INDEX]}: {e}")
+                self._inc_rows("db/rows_failed", [row])
+                continue
+            written.append(row)
+        return written, returned
+
+    def _inc(self, key, count=1, stats=None):
+        stats = stats if stats is not None else self.stats
+        if stats is not None:
+            _call_on_reactor(stats.inc_value, key, count)
+
+    def _inc_rows(self, key, rows, batch=()):
+        """Counts ``rows`` under ``key`` in the stats of the crawler each came from.
+
+        Every crawler with a row in ``batch`` gets the key, if only as 0.
+        """
+        counts = {id(row[STATS_INDEX]): [row[STATS_INDEX], 0] for row in batch}
+        for row in rows:
+            counts.setdefault(id(row[STATS_INDEX]), [row[STATS_INDEX], 0])[1] += 1
+        for stats, count in counts.values():
+            self._inc(key, count, stats)
+
+
+def acquire_shared_writer(key, create):
+    """Returns the running writer registered under ``key``, starting one with ``create()`` for the first user."""
+    with _shared_writers_lock:
+        entry = _shared_writers.get(key)
+        if entry is None:
+            writer = create()
+            writer.start()
+            entry = _shared_writers[key] = [writer, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_shared_writer(key):
+    """Drops one user of ``key``; returns the writer once nobody uses it, for the caller to close."""
+    with _shared_writers_lock:
+        entry = _shared_writers.get(key)
+        if entry is None:
+            return None
+        entry[1] -= 1
+        if entry[1] > 0:
+            return None
+        del _shared_writers[key]
+        return entry[0]
@@ -1,56 +1,133 @@
 import asyncio
+import os
 import random
 import logging
-from pyppeteer import launch
+import time
+from functools import partial
 from scrapy.http import HtmlResponse
 from scrapy.utils.defer import deferred_from_coro
 from scrapy.utils.reactor import verify_installed_reactor
 
+from clothing_scraper.browsers import (
+    BrowserShard,
+    acquire_shared_shards,
+    pick_least_loaded,
+    release_shared_shards,
+)
+from clothing_scraper.interception import InterceptionPolicy
+from clothing_scraper.readiness import (
+    NetworkIdleTracker,
+    ReadinessCondition,
+    record_time_to_ready,
+    wait_for_page_ready,
+)
+from clothing_scraper.xhr_capture import ResponseCapture
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/115.0',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0',
+]
+
 class PyppeteerDownloadHandler:
-    def __init__(self, settings):
+    def __init__(self, settings, stats=None):
         verify_installed_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
-        self.browser = None
+        self.interception_policy = None
+        self.settings = settings
+        self.stats = stats
+        # Pages are leased per request and returned once the spider callback is done with them
+        self.page_pool_size = settings.getint('PYPPETEER_PAGE_POOL_SIZE', settings.getint('CONCURRENT_REQUESTS', 16))
         self.launch_options = {
             'headless': settings.getbool('PYPPETEER_HEADLESS', True),
             'args': settings.getlist('PYPPETEER_LAUNCH_ARGS', ['--no-sandbox', '--disable-setuid-sandbox']),
             'autoClose': False, # Keep browser open for multiple requests
         }
-        self.user_agents = settings.getlist('USER_AGENTS', [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/115.0',
-            'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0',
-        ])
+        # Requests are spread over several browsers; each one is launched on first use
+        browser_count = settings.getint('PYPPETEER_BROWSER_COUNT') or os.cpu_count() or 1
+        max_failures = settings.getint('PYPPETEER_BROWSER_MAX_FAILURES', 3)
+        max_restarts = settings.getint('PYPPETEER_BROWSER_MAX_RESTARTS', 5)
+
+        def create_shards():
+            return [
+                BrowserShard(
+                    index,
+                    self.launch_options,
+                    self.page_pool_size,
+                    stats=stats,
+                    max_failures=max_failures,
+                    max_restarts=max_restarts,
+                )
+                for index in range(browser_count)
+            ]
+
+        # With PYPPETEER_SHARE_BROWSERS, crawlers in the same process whose browser settings
+        # match use one set of shards; their browser/page pool stats go to the first crawler
+        self.share_key = None
+        if settings.getbool('PYPPETEER_SHARE_BROWSERS', True):
+            self.share_key = (
+                self.launch_options['headless'],
+                tuple(self.launch_options['args']),
+                self.page_pool_size,
+                browser_count,
+                max_failures,
+                max_restarts,
+            )
+            self.shards = acquire_shared_shards(self.share_key, create_shards)
+        else:
+            self.shards = create_shards()
+        self.closed = False
+        self.user_agents = settings.getlist('USER_AGENTS', DEFAULT_USER_AGENTS)
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings)
-
-    async def _launch_browser(self):
-        if not self.browser:
-            logger.info("Launching Pyppeteer browser...")
-            self.browser = await launch(handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False, **self.launch_options)
-            logger.info("Pyppeteer browser launched.")
+        return cls(crawler.settings, crawler.stats)
 
     def download_request(self, request, spider):
         return deferred_from_coro(self._download_request_async(request, spider))
 
     async def _download_request_async(self, request, spider):
-        await self._launch_browser()
+        shard = pick_least_loaded(self.shards)
+        shard.in_flight += 1
+        generation = shard.generation
+        try:
+            await shard.ensure_launched()
+            # The lease belongs to the browser it actually runs on, even if a restart happened while we waited
+            generation = shard.generation
+            page_pool = shard.page_pool
+            page = await page_pool.acquire()
+        except Exception:
+            shard.in_flight -= 1
+            await shard.record_failure(generation)
+            raise
+        logger.debug(f"DEBUG: Pyppeteer page leased from browser #{shard.index} for {request.url}: {page}")
 
-        page = await self.browser.newPage()
-        logger.debug(f"DEBUG: Pyppeteer page created for {request.url}: {page}")
-        await page.setViewport({'width': 1920, 'height': 1080})
-        await page.setUserAgent(random.choice(self.user_agents))
+        if self.interception_policy is None:
+            self.interception_policy = InterceptionPolicy.from_spider(spider, self.settings, self.stats)
 
+        tracker = None
+        interception = None
+        capture = None
         try:
+            await page.setUserAgent(random.choice(self.user_agents))
+            if self.interception_policy.enabled and request.meta.get('block_resources', True):
+                interception = await self.interception_policy.attach(page)
+            capture_patterns = getattr(spider, 'capture_xhr_patterns', None)
+            if capture_patterns:
+                capture = ResponseCapture(page, capture_patterns, stats=self.stats).start()
+            condition = ReadinessCondition.for_request(request, spider, self.settings)
+            if condition.network_idle_ms:
+                tracker = NetworkIdleTracker(page)
+
             logger.info(f"Navigating to {request.url} using Pyppeteer...")
+            started = time.monotonic()
             response = await page.goto(request.url, {'waitUntil': 'domcontentloaded', 'timeout': 120000})
-            await asyncio.sleep(10) # Add a 10-second delay for dynamic content to load
+            ready = await wait_for_page_ready(page, condition, tracker)
+            record_time_to_ready(self.stats, request.url, time.monotonic() - started, ready)
             # await self._handle_popups_aggressively(page) # Temporarily commented out for debugging
 
             content = await page.content()
@@ -65,10 +142,31 @@ class PyppeteerDownloadHandler:
                 request=request
             )
             response_obj.meta['page'] = page # Attach the page object to meta
+            if capture is not None:
+                response_obj.meta['xhr_capture'] = capture
+            # PageReleaseMiddleware hands the page back once the callback has finished with it
+            response_obj.meta['page_release'] = partial(self._release_page, shard, page_pool, page, interception, capture)
+            shard.record_success()
             return response_obj
         except Exception as e:
             logger.error(f"Error downloading {request.url} with Pyppeteer: {e}")
+            await self._release_page(shard, page_pool, page, interception, capture)
+            await shard.record_failure(generation)
             raise
+        finally:
+            if tracker is not None:
+                tracker.detach()
+
+    async def _release_page(self, shard, page_pool, page, interception, capture=None):
+        shard.in_flight -= 1
+        if capture is not None:
+            capture.stop()
+        if interception is not None:
+            try:
+                await interception.detach()
+            except Exception as e:
+                logger.debug(f"Could not disable request interception: {e}")
+        await page_pool.release(page)
 
     async def _handle_popups_aggressively(self, page):
         # Simplified popup handling: just try to click the main accept button if it exists
@@ -84,11 +182,16 @@ class PyppeteerDownloadHandler:
             pass # Popup not found or clickable, continue
 
     async def close_browser(self):
-        if self.browser:
-            logger.info("Closing Pyppeteer browser...")
-            await self.browser.close()
-            self.browser = None
-            logger.info("Pyppeteer browser closed.")
+        if self.closed:
+            return
+        self.closed = True
+        # Shared shards are only closed by the last crawler using them
+        shards = release_shared_shards(self.share_key) if self.share_key is not None else self.shards
+        await asyncio.gather(*(shard.close() for shard in shards))
+
+    def close(self):
+        # Called by Scrapy's download handler manager when the engine stops
+        return deferred_from_coro(self.close_browser())
 
     def spider_closed(self):
-        return deferred_from_coro(self.close_browser())
\ No newline at end of file
+        return deferred_from_coro(self.close_browser())
@@ -1,6 +1,9 @@
 import asyncio
+import queue
 import random
 import logging
+import threading
+import time
 from scrapy.http import HtmlResponse
 from scrapy.utils.defer import deferred_from_coro
 from scrapy.utils.reactor import verify_installed_reactor
@@ -9,12 +12,92 @@ import undetected_chromedriver as uc
 from twocaptcha import TwoCaptcha
 import re
 
+from clothing_scraper.readiness import ReadinessCondition, record_time_to_ready, wait_for_driver_ready
+
 logger = logging.getLogger(__name__)
 
+# undetected_chromedriver patches the chromedriver binary on launch, which races
+# when several drivers start at once
+_launch_lock = threading.Lock()
+
+
+def _resolve(future, result=None, error=None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class DriverWorker(threading.Thread):
+    """Owns one Chrome driver and serves its request queue on a dedicated thread.
+
+    Selenium and 2Captcha calls are blocking, so they run here rather than on
+    the reactor; the coroutine that submitted the request just awaits a future.
+    """
+
+    def __init__(self, index, handler):
+        super().__init__(name=f"uc-driver-{index}", daemon=True)
+        self.index = index
+        self.handler = handler
+        self.driver = None
+        self.requests = queue.Queue()
+        self.pending = 0  # Queued or in progress; only touched from the event loop
+
+    def submit(self, request, spider):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending += 1
+        self.requests.put((request, spider, loop, future))
+        return future
+
+    def stop(self):
+        self.requests.put(None)
+
+    def run(self):
+        while True:
+            job = self.requests.get()
+            if job is None:
+                break
+            request, spider, loop, future = job
+            try:
+                result = self.handler._fetch(self, request, spider)
+            except Exception as e:
+                loop.call_soon_threadsafe(_resolve, future, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, future, result)
+        self._quit()
+
+    def ensure_driver(self):
+        if self.driver is None:
+            logger.info(f"Launching undetected_chromedriver browser #{self.index}...")
+            options = Options()
+            if self.handler.headless:
+                options.add_argument('--headless')
+            for arg in self.handler.launch_args:
+                options.add_argument(arg)
+            with _launch_lock:
+                self.driver = uc.Chrome(options=options)
+            logger.info(f"undetected_chromedriver browser #{self.index} launched.")
+        return self.driver
+
+    def _quit(self):
+        if self.driver:
+            logger.info(f"Closing undetected_chromedriver browser #{self.index}...")
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning(f"Error closing undetected_chromedriver browser #{self.index}: {e}")
+            self.driver = None
+            logger.info(f"undetected_chromedriver browser #{self.index} closed.")
+
+
 class UndetectedChromeDriverDownloadHandler:
-    def __init__(self, settings):
+    def __init__(self, settings, stats=None):
         verify_installed_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
-        self.driver = None
+        self.settings = settings
+        self.stats = stats
         self.headless = settings.getbool('PYPPETEER_HEADLESS', True)
         self.launch_args = settings.getlist('PYPPETEER_LAUNCH_ARGS', [
             '--no-sandbox',
@@ -26,24 +109,16 @@ class UndetectedChromeDriverDownloadHandler:
         self.user_agent = settings.get('USER_AGENT') # Get the user agent from settings
         # You need to provide your 2Captcha API key here
         self.solver = TwoCaptcha('YOUR_2CAPTCHA_API_KEY') 
+        # Each driver runs on its own thread with its own request queue; drivers start on first use
+        self.workers = [DriverWorker(index, self) for index in range(max(1, settings.getint('UC_DRIVER_POOL_SIZE', 2)))]
+        for worker in self.workers:
+            worker.start()
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings)
+        return cls(crawler.settings, crawler.stats)
 
-    async def _launch_browser(self):
-        if not self.driver:
-            logger.info("Launching undetected_chromedriver browser...")
-            options = Options()
-            if self.headless:
-                options.add_argument('--headless')
-            for arg in self.launch_args:
-                options.add_argument(arg)
-            
-            self.driver = uc.Chrome(options=options)
-            logger.info("undetected_chromedriver browser launched.")
-
-    async def _handle_datadome_captcha(self, url):
+    def _handle_datadome_captcha(self, driver, url, condition):
         logger.info(f"DataDome CAPTCHA detected on {url}. Attempting to solve...")
         try:
             # Use the datadome method from 2Captcha
@@ -57,11 +132,11 @@ class UndetectedChromeDriverDownloadHandler:
                 for cookie_part in cookies_str.split(';'):
                     if '=' in cookie_part:
                         name, value = cookie_part.split('=', 1)
-                        self.driver.add_cookie({'name': name.strip(), 'value': value.strip(), 'domain': '.celio.com'})
+                        driver.add_cookie({'name': name.strip(), 'value': value.strip(), 'domain': '.celio.com'})
                 
                 logger.info("Cookies injected. Reloading page...")
-                self.driver.get(url) # Reload the page with the new cookies
-                await asyncio.sleep(5) # Give some time for the page to load
+                driver.get(url) # Reload the page with the new cookies
+                wait_for_driver_ready(driver, condition)
                 return True
             else:
                 logger.error(f"Failed to solve CAPTCHA: {result}")
@@ -70,25 +145,32 @@ class UndetectedChromeDriverDownloadHandler:
             logger.error(f"Error solving CAPTCHA: {e}")
             return False
 
+    def _fetch(self, worker, request, spider):
+        # Runs on the worker thread: everything in here may block
+        driver = worker.ensure_driver()
+        condition = ReadinessCondition.for_request(request, spider, self.settings)
+        logger.info(f"Navigating to {request.url} using undetected_chromedriver #{worker.index}...")
+        started = time.monotonic()
+        driver.get(request.url)
+        ready = wait_for_driver_ready(driver, condition)
+        elapsed = time.monotonic() - started
+
+        # Check for DataDome CAPTCHA
+        if "geo.captcha-delivery.com" in driver.current_url or "DataDome CAPTCHA" in driver.page_source:
+            if not self._handle_datadome_captcha(driver, request.url, condition):
+                raise Exception("CAPTCHA bypass failed")
+
+        return driver.page_source, driver.current_url, elapsed, ready
+
     def download_request(self, request, spider):
         return deferred_from_coro(self._download_request_async(request, spider))
 
     async def _download_request_async(self, request, spider):
-        await self._launch_browser()
-
+        worker = min(self.workers, key=lambda w: (w.pending, w.index))
         try:
-            logger.info(f"Navigating to {request.url} using undetected_chromedriver...")
-            self.driver.get(request.url)
-            await asyncio.sleep(10) # Add a 10-second delay for dynamic content to load
-
-            # Check for DataDome CAPTCHA
-            if "geo.captcha-delivery.com" in self.driver.current_url or "DataDome CAPTCHA" in self.driver.page_source:
-                if not await self._handle_datadome_captcha(request.url):
-                    raise Exception("CAPTCHA bypass failed")
-
-            content = self.driver.page_source
+            content, url, elapsed, ready = await worker.submit(request, spider)
+            record_time_to_ready(self.stats, request.url, elapsed, ready)
             status = 200 # undetected_chromedriver doesn't directly expose status code, assume 200 if no error
-            url = self.driver.current_url
 
             response_obj = HtmlResponse(
                 url=url,
@@ -101,13 +183,17 @@ class UndetectedChromeDriverDownloadHandler:
         except Exception as e:
             logger.error(f"Error downloading {request.url} with undetected_chromedriver: {e}")
             raise
+        finally:
+            worker.pending -= 1
 
     async def close_browser(self):
-        if self.driver:
-            logger.info("Closing undetected_chromedriver browser...")
-            self.driver.quit()
-            self.driver = None
-            logger.info("undetected_chromedriver browser closed.")
+        for worker in self.workers:
+            worker.stop()
+        await asyncio.gather(*(asyncio.to_thread(worker.join) for worker in self.workers))
+
+    def close(self):
+        # Called by Scrapy's download handler manager when the engine stops
+        return deferred_from_coro(self.close_browser())
 
     def spider_closed(self):
         return deferred_from_coro(self.close_browser())
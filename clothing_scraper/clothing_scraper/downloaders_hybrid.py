@@ -0,0 +1,169 @@
+import inspect
+import logging
+import random
+import re
+from urllib.parse import urlparse
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler, TunnelError
+from scrapy.http import TextResponse
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from scrapy.utils.misc import load_object
+from twisted.internet import error as twisted_error
+from twisted.internet.defer import Deferred
+from twisted.web.client import ResponseFailed
+
+from clothing_scraper.downloaders import DEFAULT_USER_AGENTS
+
+logger = logging.getLogger(__name__)
+
+HTTP = 'http'
+BROWSER = 'browser'
+
+# Failures of the plain HTTP attempt that mean "use the browser" (the ones RetryMiddleware
+# retries); anything else is a bug and propagates
+HTTP_ERRORS = (
+    twisted_error.TimeoutError,
+    twisted_error.DNSLookupError,
+    twisted_error.ConnectionRefusedError,
+    twisted_error.ConnectionDone,
+    twisted_error.ConnectError,
+    twisted_error.ConnectionLost,
+    twisted_error.TCPTimedOutError,
+    ResponseFailed,
+    TunnelError,
+    IOError,
+)
+
+
+async def _resolve(result):
+    """Awaits what a download handler method returned: a Deferred, a coroutine or a plain value.
+
+    Scrapy's own handlers went from Deferred-returning to async methods across versions.
+    """
+    if isinstance(result, Deferred):
+        return await maybe_deferred_to_future(result)
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+def default_route_key(url):
+    """Groups URLs that share a page template: digits collapse and the last path segment is a wildcard.
+
+    https://www.celio.com/fr-fr/c/chemises-chemises-en-lin -> www.celio.com/fr-fr/c/*
+    """
+    parsed = urlparse(url)
+    segments = [re.sub(r'\d+', '{n}', segment) for segment in parsed.path.strip('/').split('/') if segment]
+    if segments:
+        segments[-1] = '*'
+    return '/'.join([parsed.netloc] + segments)
+
+
+class HybridDownloadHandler:
+    """Tries a plain HTTP fetch first and only escalates to a browser when the spider's check fails.
+
+    Spiders opt in by routing http/https here in DOWNLOAD_HANDLERS and declaring
+    what a usable HTTP response looks like, either with an ``http_check(response)``
+    method or with ``http_check_selector`` (defaults to ``ready_selector``) and
+    ``http_min_products``. Infinite-scroll spiders set ``http_requires_total``: their
+    HTTP response is only used when it holds as many cards as the count shown by
+    ``total_count_selector``, so they stay on the browser without one. The path
+    that worked is remembered per URL pattern, and
+    patterns pinned to the browser are re-probed over HTTP every
+    HYBRID_REPROBE_EVERY requests. ``meta['force_browser']`` skips the HTTP attempt.
+    """
+
+    def __init__(self, settings, crawler):
+        self.stats = crawler.stats
+        self.http_handler = HTTP11DownloadHandler.from_crawler(crawler)
+        # Newer Scrapy versions dropped the spider argument from download handlers
+        self._http_takes_spider = 'spider' in inspect.signature(self.http_handler.download_request).parameters
+        browser_handler_cls = load_object(
+            settings.get('HYBRID_BROWSER_HANDLER', 'clothing_scraper.downloaders.PyppeteerDownloadHandler')
+        )
+        self.browser_handler = browser_handler_cls.from_crawler(crawler)
+        self.reprobe_every = settings.getint('HYBRID_REPROBE_EVERY', 50)
+        self.user_agents = settings.getlist('USER_AGENTS', DEFAULT_USER_AGENTS)
+        self.routes = {}
+        self._browser_hits = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler)
+
+    def download_request(self, request, spider):
+        return deferred_from_coro(self._download_request_async(request, spider))
+
+    def _route_key(self, spider, url):
+        route_key = getattr(spider, 'http_route_key', None)
+        return route_key(url) if route_key else default_route_key(url)
+
+    def _check(self, spider, response):
+        if response.status != 200 or not isinstance(response, TextResponse):
+            return False
+        check = getattr(spider, 'http_check', None)
+        if check is not None:
+            return bool(check(response))
+        selector = getattr(spider, 'http_check_selector', None) or getattr(spider, 'ready_selector', None)
+        if not selector:
+            return False
+        cards = len(response.css(selector))
+        if getattr(spider, 'http_requires_total', False):
+            # The server renders only the first page of an infinite-scroll listing, so any
+            # card count passes short of the total the page itself reports
+            total = self._listing_total(spider, response)
+            return total is not None and cards >= total
+        return cards >= getattr(spider, 'http_min_products', 1)
+
+    @staticmethod
+    def _listing_total(spider, response):
+        selector = getattr(spider, 'total_count_selector', None)
+        if not selector:
+            return None
+        digits = re.sub(r'\D', '', ' '.join(response.css(selector).css('::text').getall()))
+        return int(digits) if digits else None
+
+    def _should_try_http(self, key):
+        if self.routes.get(key) != BROWSER:
+            return True
+        self._browser_hits[key] = self._browser_hits.get(key, 0) + 1
+        return self.reprobe_every and self._browser_hits[key] % self.reprobe_every == 0
+
+    async def _download_request_async(self, request, spider):
+        key = self._route_key(spider, request.url)
+        if not request.meta.get('force_browser') and self._should_try_http(key):
+            headers = request.headers.copy()
+            headers.setdefault('User-Agent', random.choice(self.user_agents))
+            headers.setdefault('Accept', 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8')
+            headers.setdefault('Accept-Language', 'fr-FR,fr;q=0.9,en;q=0.8')
+            http_request = request.replace(headers=headers)
+            args = (http_request, spider) if self._http_takes_spider else (http_request,)
+            try:
+                response = await _resolve(self.http_handler.download_request(*args))
+            except HTTP_ERRORS as e:
+                logger.debug(f"Plain HTTP fetch of {request.url} failed: {e!r}")
+                self.stats.inc_value('hybrid/http_errors')
+                response = None
+
+            if response is not None and self._check(spider, response):
+                if self.routes.get(key) != HTTP:
+                    logger.info(f"Serving {key} over plain HTTP.")
+                self.routes[key] = HTTP
+                self.stats.inc_value('hybrid/http')
+                return response.replace(request=request)
+
+            if self.routes.get(key) != BROWSER:
+                logger.info(f"Plain HTTP response for {request.url} failed the spider's check, using the browser for {key}.")
+            self.routes[key] = BROWSER
+            self.stats.inc_value('hybrid/escalated')
+        else:
+            self.stats.inc_value('hybrid/browser_direct')
+
+        return await _resolve(self.browser_handler.download_request(request, spider))
+
+    def close(self):
+        return deferred_from_coro(self._close())
+
+    async def _close(self):
+        await _resolve(self.http_handler.close())
+        await _resolve(self.browser_handler.close())
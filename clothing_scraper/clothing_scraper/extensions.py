@@ -0,0 +1,56 @@
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """Copies the crawl's item and page counters into its scrape_jobs row while it runs.
+
+    Only enabled when SCRAPE_JOB_ID is set, which the API's job runner does
+    for the crawls it starts. Rows are refreshed every
+    SCRAPE_JOB_PROGRESS_INTERVAL seconds and once more when the spider closes.
+    """
+
+    def __init__(self, stats, job_id, interval):
+        self.stats = stats
+        self.job_id = job_id
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        job_id = crawler.settings.getint("SCRAPE_JOB_ID")
+        if not job_id:
+            raise NotConfigured
+        ext = cls(crawler.stats, job_id, crawler.settings.getfloat("SCRAPE_JOB_PROGRESS_INTERVAL", 5.0))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def _counters(self):
+        return {
+            "items_scraped": self.stats.get_value("item_scraped_count", 0),
+            "pages_crawled": self.stats.get_value("response_received_count", 0),
+        }
+
+    def _report(self, **fields):
+        # psycopg2 blocks, keep it off the reactor
+        d = deferToThread(db.update_scrape_job, self.job_id, **self._counters(), **fields)
+        d.addErrback(lambda failure: logger.warning(f"Could not update scrape job {self.job_id}: {failure.value}"))
+        return d
+
+    def spider_opened(self, spider):
+        self.task = LoopingCall(self._report)
+        self.task.start(self.interval, now=True)
+
+    def spider_closed(self, spider, reason):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        return self._report(finish_reason=reason)
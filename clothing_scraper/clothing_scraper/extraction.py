@@ -0,0 +1,94 @@
+import re
+
+# Field maps are plain dicts: {key: spec}. A spec has
+#   selector  CSS selector relative to the card (omit to read the card itself)
+#   prop      DOM property to read, e.g. 'innerText', 'href', 'src' (default 'textContent')
+#   attr      attribute to read with getAttribute instead of a property, e.g. 'data-original'
+#   many      True to return a list over every match instead of the first match
+#   fields    nested field map; with many=True returns one dict per match
+# Scalars come back as None when the selector matches nothing, lists as [].
+
+_READ_CARD_JS = """
+function readCard(card, fields) {
+    const out = {};
+    for (const [key, spec] of Object.entries(fields)) {
+        const read = el => {
+            if (spec.fields) return readCard(el, spec.fields);
+            const value = spec.attr ? el.getAttribute(spec.attr) : el[spec.prop || 'textContent'];
+            return value === undefined ? null : value;
+        };
+        if (spec.many) {
+            const els = spec.selector ? card.querySelectorAll(spec.selector) : [card];
+            out[key] = Array.from(els).map(read).filter(v => v !== null && v !== '');
+        } else {
+            const el = spec.selector ? card.querySelector(spec.selector) : card;
+            out[key] = el ? read(el) : null;
+        }
+    }
+    return out;
+}
+"""
+
+EXTRACT_CARDS_JS = "(cardSelector, fields) => {%s; return Array.from(document.querySelectorAll(cardSelector)).map(card => readCard(card, fields)); }" % _READ_CARD_JS
+
+EXTRACT_ELEMENT_JS = "(card, fields) => {%s; return readCard(card, fields); }" % _READ_CARD_JS
+
+# A decimal amount ("29,99"), or a whole amount next to the euro sign ("30 €", "€30"),
+# so that stray digits such as a "-30%" badge are never taken for the price
+_PRICE_RE = re.compile(r'(\d+[\.,]\d{1,2})(?!\d)|(\d+)\s*€|€\s*(\d+)')
+
+
+async def extract_cards(page, card_selector, fields):
+    """Reads every card matching ``card_selector`` in a single page.evaluate round-trip."""
+    return await page.evaluate(EXTRACT_CARDS_JS, card_selector, fields)
+
+
+async def extract_element(page, element, fields):
+    """Reads one already-resolved element handle with the same field map."""
+    return await page.evaluate(EXTRACT_ELEMENT_JS, element, fields)
+
+
+def _read_selector(node, spec):
+    if spec.get('fields'):
+        return extract_from_selector(node, spec['fields'])
+    if spec.get('attr'):
+        return node.attrib.get(spec['attr'])
+    prop = spec.get('prop', 'textContent')
+    if prop in ('innerText', 'textContent'):
+        return node.xpath('string()').get()
+    if prop == 'innerHTML':
+        return node.get()
+    # Properties like href/src/alt/title/value mirror the attribute of the same name
+    return node.attrib.get(prop)
+
+
+def extract_from_selector(card, fields):
+    """Applies a field map to a Scrapy/parsel selector, for pages that came back as plain HTML."""
+    out = {}
+    for key, spec in fields.items():
+        nodes = card.css(spec['selector']) if spec.get('selector') else [card]
+        if spec.get('many'):
+            values = (_read_selector(node, spec) for node in nodes)
+            out[key] = [v for v in values if v not in (None, '')]
+        else:
+            out[key] = _read_selector(nodes[0], spec) if nodes else None
+    return out
+
+
+def extract_cards_from_response(response, card_selector, fields):
+    return [extract_from_selector(card, fields) for card in response.css(card_selector)]
+
+
+def parse_price(text):
+    """'29,99 €' -> 29.99, '30 €' -> 30.0; None when no price is found."""
+    if not text:
+        return None
+    match = _PRICE_RE.search(text)
+    if not match:
+        return None
+    amount = next(group for group in match.groups() if group)
+    return float(amount.replace(',', '.'))
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else value
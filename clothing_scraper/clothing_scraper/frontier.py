@@ -0,0 +1,381 @@
+import base64
+import collections
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone
+
+from scrapy import signals
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.utils.misc import load_object
+from scrapy.utils.request import request_from_dict
+
+from database.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+FRONTIER_BACKENDS = {
+    'postgres': 'clothing_scraper.frontier.PostgresFrontier',
+    'redis': 'clothing_scraper.frontier.RedisFrontier',
+}
+
+
+def _to_json(value):
+    # Request dicts hold bytes (body, headers) and bytes-keyed dicts (headers), which JSON lacks
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_json(item) for key, item in value.items()}
+        return {'__items__': [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _from_json(obj):
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    if len(obj) == 1 and '__items__' in obj:
+        return {key: item for key, item in obj['__items__']}
+    return obj
+
+
+def serialize_request(request, spider):
+    """Request -> JSON bytes for the shared store. Never pickle: the store is shared, and
+    unpickling what another writer put there would run arbitrary code on every worker.
+
+    Raises TypeError when meta or cb_kwargs hold values JSON can't represent.
+    """
+    return json.dumps(_to_json(request.to_dict(spider=spider))).encode()
+
+
+def deserialize_request(data, spider):
+    """Raises ValueError for anything serialize_request didn't produce."""
+    return request_from_dict(json.loads(bytes(data), object_hook=_from_json), spider=spider)
+
+
+class PostgresFrontier:
+    """Frontier in the crawl_frontier table (migration 003), leased with FOR UPDATE SKIP LOCKED."""
+
+    def __init__(self, crawl_id, settings):
+        self.crawl_id = crawl_id
+        self.conn = get_db_connection()
+        # Each statement stands alone; a lease must be visible to other workers at once
+        self.conn.autocommit = True
+
+    def add(self, fingerprint, url, priority, data):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO crawl_frontier (crawl_id, fingerprint, url, priority, request)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (crawl_id, fingerprint) DO NOTHING
+                RETURNING id;
+                """,
+                (self.crawl_id, fingerprint, url, priority, data),
+            )
+            return cur.fetchone() is not None
+
+    def lease(self, worker, count, lease_seconds, max_attempts):
+        with self.conn.cursor() as cur:
+            # Leases that expired once too often are given up on rather than handed out again
+            cur.execute(
+                """
+                UPDATE crawl_frontier SET status = 'failed', leased_until = NULL
+                WHERE crawl_id = %s AND status = 'leased' AND leased_until < now() AND attempts >= %s;
+                """,
+                (self.crawl_id, max_attempts),
+            )
+            cur.execute(
+                """
+                UPDATE crawl_frontier
+                SET status = 'leased', leased_by = %s, attempts = attempts + 1,
+                    leased_until = now() + %s * interval '1 second'
+                WHERE id IN (
+                    SELECT id FROM crawl_frontier
+                    WHERE crawl_id = %s AND (status = 'queued' OR (status = 'leased' AND leased_until < now()))
+                    ORDER BY priority DESC, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, request;
+                """,
+                (worker, lease_seconds, self.crawl_id, count),
+            )
+            return [(row[0], bytes(row[1])) for row in cur.fetchall()]
+
+    def ack(self, frontier_id):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "UPDATE crawl_frontier SET status = 'done', leased_until = NULL WHERE id = %s;",
+                (frontier_id,),
+            )
+
+    def release(self, worker, frontier_ids):
+        if not frontier_ids:
+            return
+        with self.conn.cursor() as cur:
+            # A lease that expired may already belong to another worker; leave that one alone
+            cur.execute(
+                """
+                UPDATE crawl_frontier
+                SET status = 'queued', leased_by = NULL, leased_until = NULL, attempts = attempts - 1
+                WHERE id = ANY(%s) AND status = 'leased' AND leased_by = %s;
+                """,
+                (list(frontier_ids), worker),
+            )
+
+    def pending(self):
+        """Requests queued or leased, by any worker."""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT count(*) FROM crawl_frontier WHERE crawl_id = %s AND status IN ('queued', 'leased');",
+                (self.crawl_id,),
+            )
+            return cur.fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# Requeues expired leases (or drops them past max attempts), then moves up to
+# ARGV[3] ids from the queue to the lease set, atomically, recording ARGV[5] as their owner.
+# KEYS: queue, leases, requests, attempts, owners. ARGV: now, lease_seconds, count, max_attempts, worker
+_REDIS_LEASE_LUA = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[5], id)
+    if tonumber(redis.call('HGET', KEYS[4], id) or '0') < tonumber(ARGV[4]) then
+        redis.call('ZADD', KEYS[1], '-inf', id)
+    else
+        redis.call('HDEL', KEYS[3], id)
+        redis.call('HDEL', KEYS[4], id)
+    end
+end
+local popped = redis.call('ZPOPMIN', KEYS[1], ARGV[3])
+local leased = {}
+for i = 1, #popped, 2 do
+    local id = popped[i]
+    redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), id)
+    redis.call('HINCRBY', KEYS[4], id, 1)
+    redis.call('HSET', KEYS[5], id, ARGV[5])
+    table.insert(leased, id)
+    table.insert(leased, redis.call('HGET', KEYS[3], id))
+end
+return leased
+"""
+
+# Puts the given ids back at the head of the queue, skipping any whose lease has since
+# passed to another worker. KEYS: queue, leases, attempts, owners. ARGV: worker, ids...
+_REDIS_RELEASE_LUA = """
+for i = 2, #ARGV do
+    local id = ARGV[i]
+    if redis.call('HGET', KEYS[4], id) == ARGV[1] and redis.call('ZREM', KEYS[2], id) == 1 then
+        redis.call('HDEL', KEYS[4], id)
+        redis.call('HINCRBY', KEYS[3], id, -1)
+        redis.call('ZADD', KEYS[1], '-inf', id)
+    end
+end
+return 0
+"""
+
+
+class RedisFrontier:
+    """Frontier in Redis (or anything speaking its protocol).
+
+    A sorted-set queue, a lease set scored by expiry time, and a set of seen fingerprints.
+    """
+
+    def __init__(self, crawl_id, settings):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("FRONTIER_BACKEND = 'redis' needs the redis package: pip install redis") from e
+        self.client = redis.Redis.from_url(settings.get('FRONTIER_REDIS_URL', 'redis://localhost:6379/0'))
+        prefix = f'frontier:{crawl_id}'
+        self.keys = {
+            name: f'{prefix}:{name}'
+            for name in ('seen', 'queue', 'leases', 'requests', 'attempts', 'owners', 'next_id')
+        }
+        self._lease_script = self.client.register_script(_REDIS_LEASE_LUA)
+        self._release_script = self.client.register_script(_REDIS_RELEASE_LUA)
+
+    def add(self, fingerprint, url, priority, data):
+        if not self.client.sadd(self.keys['seen'], fingerprint):
+            return False
+        frontier_id = self.client.incr(self.keys['next_id'])
+        pipe = self.client.pipeline()
+        pipe.hset(self.keys['requests'], frontier_id, data)
+        # Higher priority first, then first in first out
+        pipe.zadd(self.keys['queue'], {frontier_id: -priority * 1e9 + frontier_id})
+        pipe.execute()
+        return True
+
+    def lease(self, worker, count, lease_seconds, max_attempts):
+        k = self.keys
+        result = self._lease_script(
+            keys=[k['queue'], k['leases'], k['requests'], k['attempts'], k['owners']],
+            args=[time.time(), lease_seconds, count, max_attempts, worker],
+        )
+        return [(int(result[i]), result[i + 1]) for i in range(0, len(result), 2)]
+
+    def ack(self, frontier_id):
+        pipe = self.client.pipeline()
+        pipe.zrem(self.keys['leases'], frontier_id)
+        pipe.hdel(self.keys['requests'], frontier_id)
+        pipe.hdel(self.keys['attempts'], frontier_id)
+        pipe.hdel(self.keys['owners'], frontier_id)
+        pipe.execute()
+
+    def release(self, worker, frontier_ids):
+        if not frontier_ids:
+            return
+        k = self.keys
+        self._release_script(
+            keys=[k['queue'], k['leases'], k['attempts'], k['owners']],
+            args=[worker, *frontier_ids],
+        )
+
+    def pending(self):
+        return self.client.zcard(self.keys['queue']) + self.client.zcard(self.keys['leases'])
+
+    def close(self):
+        self.client.close()
+
+
+class FrontierScheduler(BaseScheduler):
+    """Scheduler backed by a frontier shared by every worker crawling the same FRONTIER_CRAWL_ID.
+
+    Enable with SCHEDULER = 'clothing_scraper.frontier.FrontierScheduler' and pick
+    FRONTIER_BACKEND ('postgres' or 'redis'). Each worker enqueues the spider's start
+    URLs as seeds; the frontier's dedupe set keeps one copy of every request across
+    all workers, dont_filter ones included. Only retries get an entry of their own,
+    one per attempt. Requests are leased FRONTIER_LEASE_BATCH at a time and acknowledged
+    once their response arrives; a lease not acknowledged within
+    FRONTIER_LEASE_SECONDS (say, the worker crashed) is handed to another worker,
+    up to FRONTIER_MAX_ATTEMPTS times. A worker only goes idle once nothing is
+    queued or leased anywhere, since other workers may still add requests.
+
+    The backends block, and the engine asks whether anything is pending on every
+    loop, so that count is cached for FRONTIER_PENDING_CACHE_SECONDS.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.settings = settings
+        backend = settings.get('FRONTIER_BACKEND', 'postgres')
+        self.backend_cls = load_object(FRONTIER_BACKENDS.get(backend, backend))
+        self.lease_batch = settings.getint('FRONTIER_LEASE_BATCH', 16)
+        self.lease_seconds = settings.getint('FRONTIER_LEASE_SECONDS', 600)
+        self.max_attempts = settings.getint('FRONTIER_MAX_ATTEMPTS', 3)
+        self.pending_cache_seconds = settings.getfloat('FRONTIER_PENDING_CACHE_SECONDS', 1.0)
+        self._pending = (0.0, 0)  # (monotonic time counted, count)
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.backend = None
+        self.spider = None
+        self.buffer = collections.deque()  # (frontier_id, request) leased but not yet handed to the engine
+        # A lease is settled once its request is through the downloader, whatever the outcome:
+        # a download error left unacknowledged would be refetched on every lease expiry.
+        # response_received covers responses a downloader middleware served from elsewhere
+        crawler.signals.connect(self._request_left_downloader, signal=signals.request_left_downloader)
+        crawler.signals.connect(self._response_received, signal=signals.response_received)
+        crawler.signals.connect(self._request_dropped, signal=signals.request_dropped)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def open(self, spider):
+        self.spider = spider
+        # Every worker of one crawl must agree on this; the default starts a fresh crawl each UTC day
+        crawl_id = self.settings.get('FRONTIER_CRAWL_ID') or f"{spider.name}:{datetime.now(timezone.utc):%Y-%m-%d}"
+        self.backend = self.backend_cls(crawl_id, self.settings)
+        logger.info(f"Using the {type(self.backend).__name__} for crawl {crawl_id} as worker {self.worker}")
+
+    def close(self, reason):
+        if self.backend is None:
+            return
+        # Leased but never started: hand them straight back rather than waiting for the lease to expire
+        unstarted = [frontier_id for frontier_id, _ in self.buffer]
+        self.buffer.clear()
+        self.backend.release(self.worker, unstarted)
+        self._inc('frontier/released', len(unstarted))
+        self.backend.close()
+
+    def _inc(self, key, count=1):
+        if count:
+            self.stats.inc_value(key, count)
+
+    def enqueue_request(self, request):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        retry_times = request.meta.get('retry_times')
+        if retry_times:
+            # A retry re-fetches a URL the frontier has already seen. Only the worker holding
+            # the failed lease makes it, so keying on the attempt still dedupes across workers
+            fingerprint = f'{fingerprint}:retry:{retry_times}'
+        try:
+            data = serialize_request(request, self.spider)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Cannot put {request.url} in the frontier, its meta or cb_kwargs aren't JSON-serializable: {e}")
+            self._inc('frontier/unserializable')
+            return False
+        if not self.backend.add(fingerprint, request.url, request.priority, data):
+            self._inc('frontier/duplicates')
+            return False
+        self._inc('frontier/enqueued')
+        return True
+
+    def next_request(self):
+        if not self.buffer:
+            leased = self.backend.lease(self.worker, self.lease_batch, self.lease_seconds, self.max_attempts)
+            self._inc('frontier/leased', len(leased))
+            for frontier_id, data in leased:
+                try:
+                    request = deserialize_request(data, self.spider)
+                except ValueError as e:
+                    # Written by something else (or an older, pickling version): settle it and move on
+                    logger.error(f"Discarding undecodable frontier entry {frontier_id}: {e}")
+                    self.backend.ack(frontier_id)
+                    self._inc('frontier/undecodable')
+                    continue
+                request.meta['frontier_id'] = frontier_id
+                self.buffer.append((frontier_id, request))
+        if not self.buffer:
+            return None
+        return self.buffer.popleft()[1]
+
+    def _pending_count(self):
+        counted_at, count = self._pending
+        now = time.monotonic()
+        if now - counted_at >= self.pending_cache_seconds:
+            count = self.backend.pending()
+            self._pending = (now, count)
+        return count
+
+    def has_pending_requests(self):
+        return bool(self.buffer) or self._pending_count() > 0
+
+    def __len__(self):
+        return len(self.buffer) + self._pending_count()
+
+    def _ack(self, request):
+        # Popped so that the signals reporting the same request only ack it once
+        frontier_id = request.meta.pop('frontier_id', None)
+        if frontier_id is not None:
+            self.backend.ack(frontier_id)
+            self._inc('frontier/acked')
+
+    def _request_left_downloader(self, request, spider):
+        self._ack(request)
+
+    def _response_received(self, response, request, spider):
+        self._ack(request)
+
+    def _request_dropped(self, request, spider):
+        self._ack(request)
@@ -0,0 +1,109 @@
+import logging
+from urllib.parse import urlparse
+
+from clothing_scraper.items import ClothingItem
+from api.spiders import PageType
+
+logger = logging.getLogger(__name__)
+
+# Catalogue endpoints the Inditex storefronts (Bershka, Pull&Bear) fill their product grids from
+PRODUCT_FEED_PATTERNS = [
+    r'/itxrest/\d+/catalog/store/\d+/\d+/productsArray',
+    r'/itxrest/\d+/catalog/store/\d+/\d+/category/\d+/product',
+]
+
+
+def _locale_root(page_url):
+    # https://www.bershka.com/fr/homme/... -> https://www.bershka.com/fr
+    parsed = urlparse(page_url)
+    locale = parsed.path.strip('/').split('/')[0]
+    return f"{parsed.scheme}://{parsed.netloc}/{locale}"
+
+
+def _detail(product):
+    # Bundles keep their colours on the first summary rather than on the product itself
+    detail = product.get('detail') or {}
+    if not detail.get('colors'):
+        for summary in product.get('bundleProductSummaries') or []:
+            if (summary.get('detail') or {}).get('colors'):
+                return summary['detail']
+    return detail
+
+
+def _product_url(product):
+    if product.get('productUrl'):
+        return product['productUrl']
+    for summary in product.get('bundleProductSummaries') or []:
+        if summary.get('productUrl'):
+            return summary['productUrl']
+    return None
+
+
+def _price(colors):
+    # Prices are integer cents serialised as strings, e.g. "2599"
+    for color in colors:
+        for size in color.get('sizes') or []:
+            price = size.get('price')
+            if price:
+                try:
+                    return int(price) / 100
+                except (TypeError, ValueError):
+                    continue
+    return None
+
+
+def _image_urls(color, detail):
+    urls = []
+    image = color.get('image') or {}
+    if image.get('url'):
+        urls.append(image['url'])
+    for xmedia in detail.get('xmedia') or []:
+        for media_item in xmedia.get('xmediaItems') or []:
+            for media in media_item.get('medias') or []:
+                url = (media.get('extraInfo') or {}).get('url') or media.get('url')
+                if url and url.startswith('http'):
+                    urls.append(url)
+    return urls
+
+
+def items_from_product_feed(payloads, page_url):
+    """Builds ClothingItems from captured Inditex productsArray/category payloads.
+
+    Yields nothing for payloads that don't look like a product feed, so the
+    caller can fall back to scraping the DOM.
+    """
+    root = _locale_root(page_url)
+    seen = set()
+    for payload in payloads:
+        data = payload.get('data')
+        if not isinstance(data, dict):
+            continue
+        for product in data.get('products') or []:
+            name = (product.get('name') or '').strip()
+            product_url = _product_url(product)
+            if not name or not product_url:
+                continue
+            product_link = product_url if product_url.startswith('http') else f"{root}/{product_url.lstrip('/')}"
+            if product_link in seen:
+                continue
+            seen.add(product_link)
+
+            detail = _detail(product)
+            colors = detail.get('colors') or []
+            sizes = []
+            for color in colors:
+                for size in color.get('sizes') or []:
+                    size_name = (size.get('name') or '').strip()
+                    if size_name and size_name not in sizes:
+                        sizes.append(size_name)
+
+            item = ClothingItem()
+            item["name"] = name
+            item["product_link"] = product_link
+            item["price"] = _price(colors)
+            item["colors"] = [c['name'].strip() for c in colors if c.get('name')]
+            item["sizes"] = sizes
+            item["image_urls"] = _image_urls(colors[0], detail) if colors else []
+            item["description"] = detail.get('longDescription') or detail.get('description') or None
+            item["page_type"] = PageType.PRODUCT
+            yield item
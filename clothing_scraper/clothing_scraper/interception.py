@@ -0,0 +1,133 @@
+import asyncio
+import base64
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['image', 'media', 'font']
+
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    r'google-analytics\.com',
+    r'googletagmanager\.com',
+    r'googleadservices\.com',
+    r'doubleclick\.net',
+    r'connect\.facebook\.net',
+    r'analytics\.tiktok\.com',
+    r'bat\.bing\.com',
+    r'static\.hotjar\.com',
+    r'criteo\.(com|net)',
+    r'contentsquare\.net',
+    r'scorecardresearch\.com',
+    r'sc-static\.net',
+    r'pinimg\.com/ct',
+    r'cdn\.optimizely\.com',
+    r'quantummetric\.com',
+    r'/collect\?',
+    r'/beacon',
+]
+
+# Rough average transfer size per resource type, used to estimate what blocking saved
+DEFAULT_BYTES_ESTIMATE = {
+    'image': 60_000,
+    'media': 500_000,
+    'font': 40_000,
+    'script': 50_000,
+    'stylesheet': 30_000,
+}
+
+# Blocked images get a 1x1 transparent GIF instead of an abort so that `src`
+# still resolves and lazy loaders waiting on `load` keep working
+TRANSPARENT_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+class InterceptionPolicy:
+    """Aborts browser requests by resource type and URL pattern.
+
+    The handler builds one per spider from the ``blocked_resource_types`` and
+    ``blocked_url_patterns`` spider attributes, falling back to the
+    PYPPETEER_BLOCKED_RESOURCE_TYPES / PYPPETEER_BLOCKED_URL_PATTERNS settings.
+    A request can opt out with ``meta['block_resources'] = False``.
+    """
+
+    def __init__(self, resource_types, url_patterns, stats=None, bytes_estimate=None):
+        self.resource_types = set(resource_types)
+        self.url_pattern = re.compile('|'.join(url_patterns)) if url_patterns else None
+        self.stats = stats
+        self.bytes_estimate = bytes_estimate or DEFAULT_BYTES_ESTIMATE
+
+    @classmethod
+    def from_spider(cls, spider, settings, stats=None):
+        resource_types = getattr(spider, 'blocked_resource_types', None)
+        if resource_types is None:
+            resource_types = settings.getlist('PYPPETEER_BLOCKED_RESOURCE_TYPES', DEFAULT_BLOCKED_RESOURCE_TYPES)
+        url_patterns = getattr(spider, 'blocked_url_patterns', None)
+        if url_patterns is None:
+            url_patterns = settings.getlist('PYPPETEER_BLOCKED_URL_PATTERNS', DEFAULT_BLOCKED_URL_PATTERNS)
+        bytes_estimate = {**DEFAULT_BYTES_ESTIMATE, **settings.getdict('PYPPETEER_BLOCKED_BYTES_ESTIMATE')}
+        return cls(resource_types, url_patterns, stats, bytes_estimate)
+
+    @property
+    def enabled(self):
+        return bool(self.resource_types or self.url_pattern)
+
+    def should_block(self, resource_type, url):
+        if url.startswith('data:'):
+            return False
+        if resource_type in self.resource_types:
+            return True
+        return bool(self.url_pattern and self.url_pattern.search(url))
+
+    async def attach(self, page):
+        interception = PageInterception(self, page)
+        await interception.start()
+        return interception
+
+    def _inc(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f'interception/{key}', count)
+
+
+class PageInterception:
+    """The policy applied to one leased page; detach before the page goes back to the pool."""
+
+    def __init__(self, policy, page):
+        self.policy = policy
+        self.page = page
+
+    def _on_request(self, request):
+        asyncio.ensure_future(self._handle(request))
+
+    def _on_response(self, response):
+        length = response.headers.get('content-length')
+        if length and length.isdigit():
+            self.policy._inc('bytes_loaded', int(length))
+
+    async def start(self):
+        await self.page.setRequestInterception(True)
+        self.page.on('request', self._on_request)
+        self.page.on('response', self._on_response)
+
+    async def _handle(self, request):
+        resource_type = request.resourceType
+        try:
+            if not self.policy.should_block(resource_type, request.url):
+                self.policy._inc('requests_allowed')
+                await request.continue_()
+                return
+            self.policy._inc('requests_blocked')
+            self.policy._inc(f'requests_blocked/{resource_type}')
+            self.policy._inc('bytes_saved_estimate', self.policy.bytes_estimate.get(resource_type, 5_000))
+            if resource_type == 'image':
+                await request.respond({'status': 200, 'contentType': 'image/gif', 'body': TRANSPARENT_GIF})
+            else:
+                await request.abort()
+        except Exception as e:
+            # The page may have navigated away or been reset while we were deciding
+            logger.debug(f"Interception of {request.url} failed: {e}")
+
+    async def detach(self):
+        self.page.remove_listener('request', self._on_request)
+        self.page.remove_listener('response', self._on_response)
+        if not self.page.isClosed():
+            await self.page.setRequestInterception(False)
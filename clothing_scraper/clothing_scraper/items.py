@@ -8,4 +8,6 @@ class ClothingItem(scrapy.Item):
     image_urls = scrapy.Field()
     product_link = scrapy.Field()
     description = scrapy.Field()
-    page_type = scrapy.Field()
\ No newline at end of file
+    page_type = scrapy.Field()
+    content_hash = scrapy.Field()
+    category_url = scrapy.Field()  # Listing page the product was found on
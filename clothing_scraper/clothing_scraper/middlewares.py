@@ -1,6 +1,12 @@
 import logging
-from scrapy import signals
+from scrapy import Request, signals
 from scrapy.http import HtmlResponse
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet.threads import deferToThread
+
+from clothing_scraper.items import ClothingItem
+from database.db import get_db_connection
+from database.hashing import compute_content_hash
 
 logger = logging.getLogger(__name__)
 
@@ -34,4 +40,107 @@ class CaptchaMiddleware:
         return response
 
     def spider_opened(self, spider):
-        logger.info(f"CaptchaMiddleware enabled for spider {spider.name}")
\ No newline at end of file
+        logger.info(f"CaptchaMiddleware enabled for spider {spider.name}")
+
+class PageReleaseMiddleware:
+    """Returns the leased Pyppeteer page to its pool once the spider callback has finished."""
+
+    async def process_spider_output(self, response, result, spider):
+        try:
+            async for r in result:
+                yield r
+        finally:
+            await self._release(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        # Must return None or an iterable, so the release runs in the background
+        deferred_from_coro(self._release(response))
+        return None
+
+    async def _release(self, response):
+        release = response.meta.pop('page_release', None)
+        if release is None:
+            return
+        response.meta.pop('page', None)
+        response.meta.pop('xhr_capture', None)
+        try:
+            await release()
+        except Exception as e:
+            logger.warning(f"Could not return page to the pool for {response.url}: {e}")
+
+
+class DeltaCrawlMiddleware:
+    """Drops products the last crawls already stored unchanged, using product_fingerprints.
+
+    Fingerprints seen within the freshness window (DELTA_FRESHNESS_HOURS, or a
+    spider's ``delta_freshness_hours``; 0, the default, turns this off) are
+    loaded when the spider opens. An item whose product_link is among them is
+    dropped when its content hash is unchanged, and a Request for such a
+    product_link is not sent; ``meta['delta_skip'] = False`` forces it.
+
+    The spiders here read everything from listing pages and make no per-product
+    requests, so the listings are still fetched and scrolled in full: the
+    saving is on the database side only, and the pipeline already skips
+    rewriting unchanged rows. Dropped items are missing from
+    item_scraped_count and don't refresh last_seen_at, so each product is
+    written again once the window lapses.
+
+    Items also get the listing page they came from as ``category_url``.
+    """
+
+    def __init__(self, stats, freshness_hours):
+        self.stats = stats
+        self.freshness_hours = freshness_hours
+        self.fresh = {}  # product_link -> content_hash
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler.stats, crawler.settings.getfloat('DELTA_FRESHNESS_HOURS', 0))
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
+
+    def spider_opened(self, spider):
+        self.freshness_hours = getattr(spider, 'delta_freshness_hours', self.freshness_hours)
+        if not self.freshness_hours:
+            return None
+        d = deferToThread(self._load_fresh, self.freshness_hours)
+        d.addCallback(self._loaded, spider)
+        d.addErrback(lambda failure: spider.logger.warning(
+            f"Delta crawling disabled, could not load product fingerprints: {failure.value}"
+        ))
+        return d
+
+    def _load_fresh(self, hours):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT product_link, content_hash FROM product_fingerprints
+                    WHERE last_seen_at > now() - %s * interval '1 hour';
+                    """,
+                    (hours,),
+                )
+                return dict(cur.fetchall())
+        finally:
+            conn.close()
+
+    def _loaded(self, fresh, spider):
+        self.fresh = fresh
+        spider.logger.info(f"Delta crawling: {len(fresh)} products seen in the last {self.freshness_hours}h")
+
+    async def process_spider_output(self, response, result, spider):
+        async for r in result:
+            if isinstance(r, Request):
+                link = r.meta.get('product_link', r.url)
+                if link in self.fresh and r.meta.get('delta_skip', True):
+                    self.stats.inc_value('delta/requests_skipped')
+                    continue
+            elif isinstance(r, ClothingItem):
+                r.setdefault('category_url', response.url)
+                link = r.get('product_link')
+                if link in self.fresh and self.fresh[link] == compute_content_hash(r):
+                    self.stats.inc_value('delta/items_skipped')
+                    continue
+                self.stats.inc_value('delta/items_new' if link not in self.fresh else 'delta/items_changed')
+            yield r
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PagePool:
+    """A bounded pool of Pyppeteer pages leased one per request and reset before reuse."""
+
+    def __init__(self, browser, size, stats=None, viewport=None):
+        self.browser = browser
+        self.size = max(1, size)
+        self.stats = stats
+        self.viewport = viewport or {'width': 1920, 'height': 1080}
+        self._idle = deque()
+        self._pages = set()  # Every open page, idle or leased
+        self._created = 0
+        self._leased = 0
+        self._cond = asyncio.Condition()
+
+    @property
+    def leased(self):
+        return self._leased
+
+    def _inc(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f'pyppeteer/page_pool/{key}', count)
+
+    async def _new_page(self):
+        page = await self.browser.newPage()
+        self._pages.add(page)
+        await page.setViewport(self.viewport)
+        self._inc('pages_created')
+        return page
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        waited = False
+        async with self._cond:
+            while not self._idle and self._created >= self.size:
+                waited = True
+                await self._cond.wait()
+            if self._idle:
+                page = self._idle.popleft()
+            else:
+                page = None
+                self._created += 1
+            self._leased += 1
+
+        if waited:
+            self._inc('wait_count')
+            self._inc('wait_time', loop.time() - started)
+
+        if page is not None and not page.isClosed():
+            self._inc('pages_reused')
+            return page
+
+        # Either the pool still had room or the idle page died while parked.
+        try:
+            return await self._new_page()
+        except Exception:
+            await self._forget()
+            raise
+
+    async def release(self, page):
+        try:
+            await self._reset(page)
+        except Exception as e:
+            logger.warning(f"Discarding Pyppeteer page that failed to reset: {e}")
+            await self.discard(page)
+            return
+        async with self._cond:
+            self._leased -= 1
+            self._idle.append(page)
+            self._cond.notify()
+
+    async def discard(self, page):
+        self._pages.discard(page)
+        try:
+            if not page.isClosed():
+                await page.close()
+        except Exception:
+            pass
+        self._inc('pages_discarded')
+        await self._forget()
+
+    async def _forget(self):
+        async with self._cond:
+            self._created -= 1
+            self._leased -= 1
+            self._cond.notify()
+
+    async def _reset(self, page):
+        if page.isClosed():
+            raise RuntimeError("page is closed")
+        await page.goto('about:blank')
+
+    async def close(self):
+        """Closes every page the pool created, leased ones included."""
+        self._idle.clear()
+        pages, self._pages = self._pages, set()
+        for page in pages:
+            try:
+                if not page.isClosed():
+                    await page.close()
+            except Exception:
+                pass
+        self._created = 0
+        self._leased = 0
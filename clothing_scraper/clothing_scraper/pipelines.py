@@ -1,9 +1,52 @@
+import logging
 import os
+import queue
 
 import psycopg2
+from twisted.internet.threads import deferToThread
+
+from api.cache import get_cache
+from clothing_scraper.db_writer import DatabaseWriter, acquire_shared_writer, release_shared_writer
+from database.hashing import compute_content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ContentHashPipeline:
+    """Stamps each item with the hash DatabasePipeline uses to skip unchanged rows."""
+
+    def process_item(self, item, spider):
+        item["content_hash"] = compute_content_hash(item)
+        return item
 
 
 class DatabasePipeline:
+    """Hands items to a DatabaseWriter thread that batches them into multi-row inserts.
+
+    A batch is flushed once DB_BATCH_SIZE rows are queued, every
+    DB_FLUSH_INTERVAL seconds, and when the spider closes. At most
+    DB_QUEUE_SIZE rows wait in memory; past that, items are held back
+    until the writer catches up.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=5.0, queue_size=5000, stats=None, share_writer=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.stats = stats
+        self.share_writer = share_writer
+        self.share_key = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("DB_BATCH_SIZE", 500),
+            flush_interval=crawler.settings.getfloat("DB_FLUSH_INTERVAL", 5.0),
+            queue_size=crawler.settings.getint("DB_QUEUE_SIZE", 5000),
+            stats=crawler.stats,
+            share_writer=crawler.settings.getbool("DB_SHARE_WRITER", True),
+        )
+
     def open_spider(self, spider):
         # TODO add env variables
         db_host = os.environ.get("DB_HOST", "db")
@@ -12,43 +55,89 @@ class DatabasePipeline:
         db_password = os.environ.get("DB_PASSWORD", "my_pass")
         db_name = os.environ.get("DB_NAME", "postgres")
 
-        self.conn = psycopg2.connect(
-            host=db_host,
-            port=db_port,
-            user=db_user,
-            password=db_password,
-            dbname=db_name,
-        )
-        self.cur = self.conn.cursor()
+        def create_writer():
+            conn = psycopg2.connect(
+                host=db_host,
+                port=db_port,
+                user=db_user,
+                password=db_password,
+                dbname=db_name,
+            )
+            return DatabaseWriter(
+                conn,
+                batch_size=self.batch_size,
+                flush_interval=self.flush_interval,
+                queue_size=self.queue_size,
+                stats=self.stats,
+                on_flush=self._on_flush,
+            )
+
+        if self.share_writer:
+            # Other crawlers in this process writing to the same database reuse the writer. Each
+            # row's outcome is counted in its own crawler's db/* stats; batch-level figures
+            # (flushes, latency, rows per second) go to the crawler that opened the writer
+            self.share_key = (db_host, db_port, db_user, db_name, self.batch_size, self.flush_interval, self.queue_size)
+            self.writer = acquire_shared_writer(self.share_key, create_writer)
+        else:
+            self.writer = create_writer()
+            self.writer.start()
 
     def close_spider(self, spider):
-        self.cur.close()
-        self.conn.close()
+        if self.share_key is not None:
+            writer = release_shared_writer(self.share_key)
+            if writer is None:
+                # Still in use by another crawler, which will drain and close it
+                self._invalidate_api_cache()
+                return None
+        # Drain the queue off the reactor, then report and disconnect
+        d = deferToThread(self.writer.close)
+        d.addCallback(lambda _: self._closed(spider))
+        return d
 
-    def process_item(self, item, spider):
+    def _on_flush(self, inserted, changed):
+        if inserted or changed:
+            self._invalidate_api_cache()
+
+    def _invalidate_api_cache(self):
+        # Cached /products responses would otherwise go stale until their TTL
         try:
-            sql = """
-                INSERT INTO products (name, description, price, sizes, colors, image_urls, product_link)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (product_link) DO NOTHING;
-            """
-            price = item.get("price")
-
-            self.cur.execute(
-                sql,
-                (
-                    item.get("name"),
-                    item.get("description"),
-                    price,
-                    item.get("sizes"),
-                    item.get("colors"),
-                    item.get("image_urls"),
-                    item.get("product_link"),
-                ),
+            get_cache().invalidate()
+        except Exception as e:
+            logger.warning(f"Could not invalidate the API response cache: {e}")
+
+    def _closed(self, spider):
+        self._invalidate_api_cache()
+        writer = self.writer
+        if writer.error is not None:
+            spider.logger.error(f"Database: the writer died, items after that point were not saved: {writer.error!r}")
+        if writer.write_time:
+            spider.logger.info(
+                f"Database: wrote {writer.rows_written} rows in {writer.write_time:.2f}s "
+                f"({writer.rows_written / writer.write_time:.0f} rows/s): "
+                f"{writer.inserted} inserted, {writer.changed} changed, {writer.unchanged} unchanged"
             )
-            self.conn.commit()
-        except psycopg2.Error as e:
-            self.conn.rollback()
-            spider.logger.error(f"Database error: {e}")
-            raise
+        writer.conn.close()
+
+    def process_item(self, item, spider):
+        row = (
+            item.get("name"),
+            item.get("description"),
+            item.get("price"),
+            item.get("sizes"),
+            item.get("colors"),
+            item.get("image_urls"),
+            item.get("product_link"),
+            item.get("content_hash"),
+            item.get("category_url"),
+            self.stats,
+        )
+        try:
+            self.writer.put(row, block=False)
+        except queue.Full:
+            # Backpressure: wait for room on a thread so the reactor keeps running
+            if self.stats is not None:
+                self.stats.inc_value("db/backpressure_waits")
+            d = deferToThread(self.writer.put, row)
+            d.addCallback(lambda _: item)
+            return d
         return item
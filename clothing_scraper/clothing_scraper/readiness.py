@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.1  # Seconds between polls of a readiness predicate
+
+
+class ReadinessCondition:
+    """What a page must satisfy before its content is handed to the spider.
+
+    Spiders declare it with the ``ready_selector``, ``ready_js`` and
+    ``ready_network_idle_ms`` attributes, and a single request can override
+    them with ``meta['ready']`` (a dict using the same keys without the
+    ``ready_`` prefix). Whatever is declared, ``timeout`` is a hard ceiling.
+    """
+
+    def __init__(self, selector=None, js=None, network_idle_ms=None, timeout=10.0):
+        self.selector = selector
+        self.js = js
+        self.network_idle_ms = network_idle_ms
+        self.timeout = timeout
+
+    @classmethod
+    def for_request(cls, request, spider, settings):
+        declared = {
+            'selector': getattr(spider, 'ready_selector', None),
+            'js': getattr(spider, 'ready_js', None),
+            'network_idle_ms': getattr(spider, 'ready_network_idle_ms', None),
+        }
+        declared.update(request.meta.get('ready') or {})
+        if not any(declared.values()):
+            # Nothing declared: settle for the network going quiet
+            declared['network_idle_ms'] = settings.getint('PAGE_READY_NETWORK_IDLE_MS', 500)
+        return cls(timeout=settings.getfloat('PAGE_READY_TIMEOUT', 10.0), **declared)
+
+
+class NetworkIdleTracker:
+    """Counts in-flight requests on a Pyppeteer page. Attach it before navigating."""
+
+    def __init__(self, page):
+        self.page = page
+        self.in_flight = 0
+        self.last_activity = time.monotonic()
+        self._listeners = {
+            'request': self._on_request,
+            'requestfinished': self._on_done,
+            'requestfailed': self._on_done,
+        }
+        for event, listener in self._listeners.items():
+            page.on(event, listener)
+
+    def _on_request(self, request):
+        self.in_flight += 1
+        self.last_activity = time.monotonic()
+
+    def _on_done(self, request):
+        self.in_flight = max(0, self.in_flight - 1)
+        self.last_activity = time.monotonic()
+
+    async def wait_for_idle(self, idle_ms, deadline):
+        idle = idle_ms / 1000
+        while time.monotonic() < deadline:
+            if self.in_flight == 0 and time.monotonic() - self.last_activity >= idle:
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+        raise asyncio.TimeoutError(f"network not idle for {idle_ms} ms")
+
+    def detach(self):
+        for event, listener in self._listeners.items():
+            self.page.remove_listener(event, listener)
+
+
+async def wait_for_page_ready(page, condition, tracker=None):
+    """Waits on a Pyppeteer page until ``condition`` holds. Returns True if it did before the ceiling."""
+    deadline = time.monotonic() + condition.timeout
+    timeout_ms = int(condition.timeout * 1000)
+    waits = []
+    if condition.selector:
+        waits.append(page.waitForSelector(condition.selector, {'timeout': timeout_ms}))
+    if condition.js:
+        waits.append(page.waitForFunction(condition.js, {'timeout': timeout_ms}))
+    if condition.network_idle_ms and tracker is not None:
+        waits.append(tracker.wait_for_idle(condition.network_idle_ms, deadline))
+
+    results = await asyncio.gather(*waits, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    for error in errors:
+        logger.debug(f"Readiness predicate not met on {page.url}: {error}")
+    return not errors
+
+
+def wait_for_driver_ready(driver, condition):
+    """Polling equivalent of wait_for_page_ready for a Selenium driver. Blocks; run it off the event loop."""
+    deadline = time.monotonic() + condition.timeout
+    idle = (condition.network_idle_ms or 0) / 1000
+    resource_count = None
+    quiet_since = time.monotonic()
+
+    while time.monotonic() < deadline:
+        ready = True
+        if condition.selector:
+            ready = driver.execute_script("return !!document.querySelector(arguments[0]);", condition.selector)
+        if ready and condition.js:
+            ready = bool(driver.execute_script(f"return !!({condition.js});"))
+        if ready and idle:
+            # Selenium can't see the network, so treat a stable resource count as idle
+            count = driver.execute_script(
+                "return document.readyState === 'complete' ? performance.getEntriesByType('resource').length : -1;"
+            )
+            if count != resource_count:
+                resource_count = count
+                quiet_since = time.monotonic()
+            ready = count >= 0 and time.monotonic() - quiet_since >= idle
+        if ready:
+            return True
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def record_time_to_ready(stats, url, elapsed, ready):
+    """Accumulates per-domain time-to-ready in the crawl stats."""
+    if stats is None:
+        return
+    domain = urlparse(url).netloc
+    prefix = f'readiness/{domain}'
+    stats.inc_value(f'{prefix}/count')
+    stats.inc_value(f'{prefix}/time_to_ready', elapsed)
+    stats.max_value(f'{prefix}/max_time_to_ready', elapsed)
+    stats.min_value(f'{prefix}/min_time_to_ready', elapsed)
+    if not ready:
+        stats.inc_value(f'{prefix}/timeouts')
+    logger.debug(f"{url} ready in {elapsed:.2f}s{'' if ready else ' (ceiling reached)'}")
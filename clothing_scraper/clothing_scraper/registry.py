@@ -0,0 +1,23 @@
+from scrapy.utils.misc import load_object
+
+from api.spiders import SpiderName
+
+# Spiders that can actually be run, by name. SpiderName also lists sites with no
+# spider yet (H&M, Jules, Primark). Classes are imported on first use so that the
+# API doesn't pull in every spider module to start.
+SPIDERS = {
+    SpiderName.BERSHKA: "clothing_scraper.spiders.bershka.BershkaSpider",
+    SpiderName.CANDA: "clothing_scraper.spiders.canda.CandaSpider",
+    SpiderName.CELIO: "clothing_scraper.spiders.celio.CelioSpider",
+    SpiderName.NIKE: "clothing_scraper.spiders.nike.NikeSpider",
+    SpiderName.PULLANDBEAR: "clothing_scraper.spiders.pullandbear.PullandbearSpider",
+}
+
+
+def is_registered(spider_name):
+    return spider_name in SPIDERS
+
+
+def get_spider_class(spider_name):
+    """Returns the spider class for ``spider_name``; raises KeyError for unregistered names."""
+    return load_object(SPIDERS[spider_name])
@@ -0,0 +1,103 @@
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Scrolls to the bottom once and resolves as soon as a new card is attached
+# (or the step timeout expires), so a step costs only as long as the site takes
+_SCROLL_STEP_JS = """
+(cardSelector, totalSelector, timeoutMs) => new Promise(resolve => {
+    const count = () => document.querySelectorAll(cardSelector).length;
+    const total = () => {
+        const el = totalSelector && document.querySelector(totalSelector);
+        const digits = el ? (el.innerText || el.textContent || '').replace(/\\D/g, '') : '';
+        return digits ? parseInt(digits, 10) : null;
+    };
+    const before = count();
+    const started = performance.now();
+    let done = false;
+    let timer = null;
+    const observer = new MutationObserver(() => { if (count() > before) finish(true); });
+    const finish = grew => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        resolve({count: count(), total: total(), grew: grew, waited: performance.now() - started});
+    };
+    observer.observe(document.body, {childList: true, subtree: true});
+    timer = setTimeout(() => finish(false), timeoutMs);
+    window.scrollTo(0, document.body.scrollHeight);
+})
+"""
+
+
+class ScrollReport:
+    def __init__(self):
+        self.iterations = 0
+        self.idle_time = 0.0  # Seconds spent waiting on steps that loaded nothing
+        self.cards = 0
+        self.total = None
+        self.stop_reason = None
+
+    def __repr__(self):
+        return (
+            f"{self.cards} cards{f'/{self.total}' if self.total else ''} after {self.iterations} scrolls, "
+            f"{self.idle_time:.1f}s idle, stopped: {self.stop_reason}"
+        )
+
+
+async def scroll_to_end(page, card_selector, total_selector=None, step_timeout=3.0, max_idle_steps=3, max_iterations=200):
+    """Scrolls an infinite-scroll listing until it stops growing.
+
+    Stops when the count shown by ``total_selector`` is reached, after
+    ``max_idle_steps`` consecutive scrolls that add no card, or after
+    ``max_iterations`` scrolls.
+    """
+    report = ScrollReport()
+    idle_steps = 0
+    while report.iterations < max_iterations:
+        step = await page.evaluate(_SCROLL_STEP_JS, card_selector, total_selector, int(step_timeout * 1000))
+        report.iterations += 1
+        report.cards = step['count']
+        report.total = step['total'] or report.total
+
+        if report.total and report.cards >= report.total:
+            report.stop_reason = 'total_reached'
+            break
+        if step['grew']:
+            idle_steps = 0
+        else:
+            idle_steps += 1
+            report.idle_time += step['waited'] / 1000
+            if idle_steps >= max_idle_steps:
+                report.stop_reason = 'no_new_cards'
+                break
+    else:
+        report.stop_reason = 'max_iterations'
+    return report
+
+
+async def scroll_spider_page(page, card_selector, spider, url):
+    """scroll_to_end with the spider's declared options, recording the outcome in its stats.
+
+    Spiders may set ``total_count_selector``, ``scroll_step_timeout`` and
+    ``scroll_max_idle_steps``.
+    """
+    report = await scroll_to_end(
+        page,
+        card_selector,
+        total_selector=getattr(spider, 'total_count_selector', None),
+        step_timeout=getattr(spider, 'scroll_step_timeout', 3.0),
+        max_idle_steps=getattr(spider, 'scroll_max_idle_steps', 3),
+    )
+    logger.info(f"Scrolled {url}: {report}")
+
+    stats = getattr(getattr(spider, 'crawler', None), 'stats', None)
+    if stats is not None:
+        prefix = f'scroll/{urlparse(url).netloc}'
+        stats.inc_value(f'{prefix}/pages')
+        stats.inc_value(f'{prefix}/iterations', report.iterations)
+        stats.inc_value(f'{prefix}/idle_time', report.idle_time)
+        stats.inc_value(f'{prefix}/stopped/{report.stop_reason}')
+    return report
@@ -42,9 +42,17 @@ COOKIES_ENABLED = False
 
 # Enable or disable spider middlewares:
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "clothing_scraper.middlewares.ClothingScraperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "clothing_scraper.middlewares.PageReleaseMiddleware": 100,
+    "clothing_scraper.middlewares.DeltaCrawlMiddleware": 200,
+}
+
+# Delta crawling (off at 0): items for products stored within this many hours are dropped
+# before the pipeline when their content hash is unchanged. Listing pages are still crawled
+# in full, since no spider makes per-product requests, so this only saves database work.
+# Dropped items don't count in item_scraped_count and aren't stamped as seen, so each
+# product is written again once the window lapses (spiders: delta_freshness_hours)
+DELTA_FRESHNESS_HOURS = 0
 
 # Enable or disable downloader middlewares:
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -78,6 +86,56 @@ PYPPETEER_LAUNCH_ARGS = [
     '--disable-gpu',
     '--window-size=1920,1080',
 ]
+# Number of pages each browser keeps open for reuse; size it against CONCURRENT_REQUESTS
+PYPPETEER_PAGE_POOL_SIZE = 4
+# Browsers to shard requests across (least-loaded first); unset or 0 uses the CPU count
+#PYPPETEER_BROWSER_COUNT = 4
+# Consecutive failed requests before a browser is restarted, and restarts before it is retired
+PYPPETEER_BROWSER_MAX_FAILURES = 3
+PYPPETEER_BROWSER_MAX_RESTARTS = 5
+# Spiders crawled together in one process (main.py scrape --spider all) share browsers
+# when all of the settings above match
+PYPPETEER_SHARE_BROWSERS = True
+
+# Page readiness: spiders declare ready_selector / ready_js / ready_network_idle_ms,
+# navigation waits until those hold or the ceiling (seconds) is reached
+PAGE_READY_TIMEOUT = 10
+PAGE_READY_NETWORK_IDLE_MS = 500
+
+# Request interception: resource types and URL regexes the browser never fetches.
+# Spiders can override with blocked_resource_types / blocked_url_patterns.
+# PYPPETEER_BLOCKED_URL_PATTERNS defaults to the analytics/ads list in interception.py
+PYPPETEER_BLOCKED_RESOURCE_TYPES = ['image', 'media', 'font']
+
+# HybridDownloadHandler (opt-in per spider): browser used when plain HTTP isn't enough,
+# and how often a URL pattern pinned to the browser is retried over HTTP
+HYBRID_BROWSER_HANDLER = 'clothing_scraper.downloaders.PyppeteerDownloadHandler'
+HYBRID_REPROBE_EVERY = 50
+
+# Shared crawl frontier: several workers (containers) pull from one queue instead of each
+# process scheduling in memory. FRONTIER_BACKEND is 'postgres' (crawl_frontier table) or
+# 'redis' (FRONTIER_REDIS_URL). Workers that should cooperate need the same FRONTIER_CRAWL_ID,
+# which defaults to the spider name and the UTC date.
+#SCHEDULER = "clothing_scraper.frontier.FrontierScheduler"
+FRONTIER_BACKEND = 'postgres'
+#FRONTIER_CRAWL_ID = 'nike:2024-06-01'
+#FRONTIER_REDIS_URL = 'redis://localhost:6379/0'
+FRONTIER_LEASE_BATCH = 16
+# Visibility timeout: a request leased this long without a response goes back to the queue
+FRONTIER_LEASE_SECONDS = 600
+FRONTIER_MAX_ATTEMPTS = 3
+# How long the count of requests pending across workers is reused before asking the backend again
+FRONTIER_PENDING_CACHE_SECONDS = 1.0
+
+# Enable or disable extensions
+# See https://docs.scrapy.org/en/latest/topics/extensions.html
+EXTENSIONS = {
+    "clothing_scraper.extensions.JobProgress": 500,
+}
+
+# Crawls started through the API get SCRAPE_JOB_ID from api/jobs.py; JobProgress then
+# writes their item/page counters to scrape_jobs every SCRAPE_JOB_PROGRESS_INTERVAL seconds
+SCRAPE_JOB_PROGRESS_INTERVAL = 5
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -106,9 +164,18 @@ TWISTED_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
 # Enable or disable item pipelines:
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
+    "clothing_scraper.pipelines.ContentHashPipeline": 200,
     "clothing_scraper.pipelines.DatabasePipeline": 300,
 }
 
+# DatabasePipeline flushes a multi-row INSERT every DB_BATCH_SIZE items or DB_FLUSH_INTERVAL seconds
+# from a writer thread; at most DB_QUEUE_SIZE rows wait before the crawl is held back
+DB_BATCH_SIZE = 500
+DB_FLUSH_INTERVAL = 5.0
+DB_QUEUE_SIZE = 5000
+# Spiders crawled together in one process share one writer (and connection) per database
+DB_SHARE_WRITER = True
+
 DATABASE = {
     'host': 'localhost',
     'port': 5432,
@@ -3,18 +3,53 @@ import logging
 
 import scrapy
 
+from clothing_scraper.extraction import clean, extract_cards, extract_element, parse_price
+from clothing_scraper.inditex import PRODUCT_FEED_PATTERNS, items_from_product_feed
 from clothing_scraper.items import ClothingItem
+from clothing_scraper.scrolling import scroll_spider_page
 from api.spiders import PageType
 from api.start_urls_enum import SpiderStartUrls
 
 logger = logging.getLogger(__name__)
 
+HOVER_ALL_CARDS_JS = """
+(cardSelector) => {
+    for (const card of document.querySelectorAll(cardSelector)) {
+        const target = card.querySelector('.product-image') || card;
+        for (const type of ['pointerover', 'pointerenter', 'mouseover', 'mouseenter']) {
+            target.dispatchEvent(new MouseEvent(type, {bubbles: type.endsWith('over'), view: window}));
+        }
+    }
+}
+"""
+
 
 class BershkaSpider(scrapy.Spider):
     name = "bershka"
     allowed_domains = ["bershka.com"]
 
     start_urls = SpiderStartUrls.BERSHKA.value
+    ready_selector = ".category-product-card"
+    capture_xhr_patterns = PRODUCT_FEED_PATTERNS
+
+    card_fields = {
+        "name": {"selector": '.product-image img[data-qa-anchor="productGridMainImage"]', "prop": "alt"},
+        "product_link": {"selector": ".grid-card-link", "prop": "href"},
+        "image_original": {"selector": '.product-image img[data-qa-anchor="productGridMainImage"]', "attr": "data-original"},
+        "image_src": {"selector": '.product-image img[data-qa-anchor="productGridMainImage"]', "prop": "src"},
+        "price": {"selector": ".current-price-elem", "prop": "innerText"},
+    }
+    hover_fields = {
+        "colors": {
+            "selector": ".color-cut",
+            "many": True,
+            "fields": {
+                "input_name": {"selector": "input", "prop": "name"},
+                "image_alt": {"selector": "img", "prop": "alt"},
+            },
+        },
+        "sizes": {"selector": ".ui--size-dot-list .text__label", "prop": "innerText", "many": True},
+    }
 
     async def parse(self, response):
         if response.status == 403 or "Access Denied" in response.text:
@@ -32,126 +67,74 @@ class BershkaSpider(scrapy.Spider):
             )
             return
 
-        previous_product_count = 0
-        scroll_attempts = 0
-        max_scroll_attempts = 10  # Increased limit to prevent infinite loops
-
-        while True:
-            # Scroll to the bottom
-            await response.meta["page"].evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await response.meta["page"].waitFor(3000)  # Wait for new content to load
-
-            # Get the current number of products
-            current_products = await response.meta["page"].querySelectorAll(product_selector)
-            current_product_count = len(current_products)
-
-            if current_product_count == previous_product_count:
-                scroll_attempts += 1
-                if scroll_attempts > max_scroll_attempts:
-                    logger.info(f"Reached end of scrolling or max scroll attempts ({max_scroll_attempts}) on {response.url}.")
-                    break
-            else:
-                scroll_attempts = 0  # Reset counter if new content loaded
-            previous_product_count = current_product_count
-
-        products = await response.meta["page"].querySelectorAll(product_selector)
-
-        if not products:
+        await scroll_spider_page(response.meta["page"], product_selector, self, response.url)
+
+        capture = response.meta.get("xhr_capture")
+        if capture is not None:
+            feed_items = list(items_from_product_feed(await capture.collect(), response.url))
+            if feed_items:
+                logger.info(f"Found {len(feed_items)} products in the captured product feed on {response.url}.")
+                for item in feed_items:
+                    yield item
+                    logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
+                return
+            logger.info(f"No usable product feed captured on {response.url}, falling back to the DOM.")
+
+        page = response.meta["page"]
+        # Colors and sizes only render on hover: fire the hover events on every card
+        # at once inside the page, then read all cards in a single pass
+        await page.evaluate(HOVER_ALL_CARDS_JS, product_selector)
+        await page.waitFor(500) # One wait for all the hover states to render
+        cards = await extract_cards(page, product_selector, {**self.card_fields, **self.hover_fields})
+
+        if not cards:
             logger.warning(f"No products found using selector '{product_selector}' on {response.url}.")
             return
 
-        logger.info(f"Found {len(products)} products on {response.url}.")
+        logger.info(f"Found {len(cards)} products on {response.url}.")
+
+        # A card that rendered either list did react to the synthetic hover; single-colour
+        # and one-size products legitimately leave the other one empty
+        missing = [index for index, card in enumerate(cards) if not card["colors"] and not card["sizes"]]
+        if missing:
+            # Some cards ignore synthetic events; fall back to a real hover for just those
+            logger.info(f"Hovering {len(missing)} of {len(cards)} cards without colors or sizes on {response.url}.")
+            products = await page.querySelectorAll(product_selector)
+            for index in missing:
+                if index >= len(products):
+                    break
+                await products[index].hover()
+                await page.waitFor(500) # Small wait for elements to appear
+                cards[index].update(await extract_element(page, products[index], self.hover_fields))
+            # Move mouse away to reset hover state (optional, but good practice)
+            await page.mouse.move(0, 0)
+            self.crawler.stats.inc_value('bershka/hover_fallbacks', len(missing))
 
-        for product_element in products:
+        for card in cards:
             item = ClothingItem()
-
-            # Extract product name from image alt attribute
-            name_element = await product_element.querySelector('.product-image img[data-qa-anchor="productGridMainImage"]')
-            name = (await (await name_element.getProperty('alt')).jsonValue()).strip() if name_element else None
-
-            # Extract product link
-            product_link_element = await product_element.querySelector('.grid-card-link')
-            product_link = await (await product_link_element.getProperty('href')).jsonValue() if product_link_element else None
+            name = clean(card["name"])
+            product_link = card["product_link"]
 
             if not name or not product_link:
                 logger.warning(f"Could not extract name ({name}) or product link ({product_link}) for product on {response.url}. Skipping item.")
                 continue # Skip this item if name or product_link is not found
 
             item["name"] = name
-            item["product_link"] = response.urljoin(product_link) if product_link else None
-
-            # Extract image URLs
-            image_element = await product_element.querySelector('.product-image img[data-qa-anchor="productGridMainImage"]')
-            image_url = None
-            if image_element:
-                # Try data-original first
-                data_original = await (await image_element.getProperty('data-original')).jsonValue()
-                if data_original:
-                    image_url = data_original
-                else:
-                    # Fallback to src if data-original is not present and not a placeholder GIF
-                    src = await (await image_element.getProperty('src')).jsonValue()
-                    if src and not src.startswith('data:image/gif'):
-                        image_url = src
+            item["product_link"] = response.urljoin(product_link)
 
+            # Prefer data-original; src may still be a placeholder GIF
+            image_url = card["image_original"]
+            if not image_url and card["image_src"] and not card["image_src"].startswith('data:image/gif'):
+                image_url = card["image_src"]
             item["image_urls"] = [response.urljoin(image_url)] if image_url else []
 
-            # Extract price
-            price_element = await product_element.querySelector('.current-price-elem')
-            if price_element:
-                try:
-                    price_str = await (await price_element.getProperty('innerText')).jsonValue()
-                    import re
-                    price_match = re.search(r'(\d+[\.,]\d+)', price_str)
-                    if price_match:
-                        price_str = price_match.group(1).replace(',', '.').strip()
-                        item["price"] = float(price_str)
-                    else:
-                        item["price"] = None
-                except Exception as e:
-                    logger.warning(f"Could not extract price for {item.get('name', 'N/A')}: {e}")
-                    item["price"] = None
-            else:
-                item["price"] = None
-
-            # Simulate hover to reveal colors and sizes
-            await product_element.hover()
-            await response.meta["page"].waitFor(500) # Small wait for elements to appear
-
-            # Extract colors
-            color_elements = await product_element.querySelectorAll('.color-cut')
-            colors = []
-            for color_element in color_elements:
-                color_name = None
-                # Try to get color from input's name attribute
-                input_element = await color_element.querySelector('input')
-                if input_element:
-                    color_name = await (await input_element.getProperty('name')).jsonValue()
-                
-                # If not found, try to get color from image's alt attribute
-                if not color_name:
-                    img_element = await color_element.querySelector('img')
-                    if img_element:
-                        color_name = await (await img_element.getProperty('alt')).jsonValue()
-
-                if color_name:
-                    colors.append(color_name)
-            item["colors"] = colors if colors else []
-
-            # Extract sizes
-            size_elements = await product_element.querySelectorAll('.ui--size-dot-list .text__label')
-            sizes = []
-            for size_element in size_elements:
-                size_value = await (await size_element.getProperty('innerText')).jsonValue()
-                if size_value:
-                    sizes.append(size_value.strip())
-            item["sizes"] = sizes if sizes else []
+            item["price"] = parse_price(card["price"])
 
-            # Move mouse away to reset hover state (optional, but good practice)
-            await response.meta["page"].mouse.move(0, 0) 
+            item["colors"] = [color["input_name"] or color["image_alt"] for color in card["colors"] if color["input_name"] or color["image_alt"]]
+            item["sizes"] = [size.strip() for size in card["sizes"]]
 
             item["description"] = None
             item["page_type"] = PageType.PRODUCT
 
             yield item
-            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
\ No newline at end of file
+            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
@@ -1,8 +1,9 @@
 import scrapy
 import logging
-import re
 
+from clothing_scraper.extraction import clean, extract_cards, parse_price
 from clothing_scraper.items import ClothingItem
+from clothing_scraper.scrolling import scroll_spider_page
 from api.spiders import PageType
 from api.start_urls_enum import SpiderStartUrls
 
@@ -12,6 +13,15 @@ class CandaSpider(scrapy.Spider):
     name = "canda"
     allowed_domains = ["www.c-and-a.com"]
     start_urls = SpiderStartUrls.CANDA.value
+    ready_selector = 'li[data-qa="ProductTile"]'
+
+    card_fields = {
+        'name': {'selector': 'div[data-qa="ProductName"]', 'prop': 'innerText'},
+        'product_link': {'selector': 'a[data-qa="Link"]', 'prop': 'href'},
+        'price': {'selector': 'div[data-qa="ProductPrice"]', 'prop': 'innerText'},
+        'image_url': {'selector': 'picture img', 'prop': 'src'},
+        'colors': {'selector': 'span[data-qa="ColorSwatch"] img', 'prop': 'alt', 'many': True},
+    }
 
     async def start(self):
         for url in self.start_urls:
@@ -39,86 +49,28 @@ class CandaSpider(scrapy.Spider):
             )
             return
 
-        # Scroll down to load all products (infinite scrolling)
-        previous_product_count = 0
-        scroll_attempts = 0
-        max_scroll_attempts = 10 # Limit to prevent infinite loops
-
-        while True:
-            # Scroll to the bottom
-            await response.meta["page"].evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await response.meta["page"].waitFor(3000)  # Wait for new content to load
-
-            # Get the current number of products
-            current_products = await response.meta["page"].querySelectorAll(product_selector)
-            current_product_count = len(current_products)
+        await scroll_spider_page(response.meta["page"], product_selector, self, response.url)
 
-            if current_product_count == previous_product_count:
-                scroll_attempts += 1
-                if scroll_attempts > max_scroll_attempts:
-                    logger.info(f"Reached end of scrolling or max scroll attempts ({max_scroll_attempts}) on {response.url}.")
-                    break
-            else:
-                scroll_attempts = 0 # Reset counter if new content loaded
-            previous_product_count = current_product_count
+        # Read every product card in one round-trip (after all scrolling attempts)
+        cards = await extract_cards(response.meta["page"], product_selector, self.card_fields)
 
-        # Select all product containers using Pyppeteer (after all scrolling attempts)
-        products = await response.meta["page"].querySelectorAll(product_selector)
-
-        if not products:
+        if not cards:
             logger.warning(f"No products found using selector '{product_selector}' on {response.url}.")
             return
 
-        logger.info(f"Found {len(products)} products on {response.url}.")
+        logger.info(f"Found {len(cards)} products on {response.url}.")
 
-        for product_element in products:
+        for card in cards:
             item = ClothingItem()
-            try:
-                # Name
-                name_element = await product_element.querySelector("div[data-qa=\"ProductName\"]")
-                name = (await (await name_element.getProperty('innerText')).jsonValue()).strip() if name_element else None
-                item['name'] = name
-
-                # Product Link
-                product_link_element = await product_element.querySelector("a[data-qa=\"Link\"]")
-                product_link = await (await product_link_element.getProperty('href')).jsonValue() if product_link_element else None
-                item['product_link'] = response.urljoin(product_link) if product_link else None
-
-                # Price
-                price_element = await product_element.querySelector("div[data-qa=\"ProductPrice\"]")
-                if price_element:
-                    price_text = await (await price_element.getProperty('innerText')).jsonValue()
-                    if price_text:
-                        clean_price = re.sub(r'[^\d,\.]', '', price_text).replace(',', '.')
-                        try:
-                            item['price'] = float(clean_price)
-                        except ValueError:
-                            item['price'] = None
-                    else:
-                        item['price'] = None
-                else:
-                    item['price'] = None
-
-                # Image URLs
-                image_element = await product_element.querySelector("picture img")
-                image_src = await (await image_element.getProperty('src')).jsonValue() if image_element else None
-                item['image_urls'] = [response.urljoin(image_src)] if image_src else []
-
-                # Colors
-                color_elements = await product_element.querySelectorAll("span[data-qa=\"ColorSwatch\"] img")
-                colors = []
-                for color_el in color_elements:
-                    color_name = await (await color_el.getProperty('alt')).jsonValue()
-                    if color_name:
-                        colors.append(color_name.strip())
-                item['colors'] = colors if colors else []
-
-                item['sizes'] = [] # Sizes are not available on the listing page
-                item['description'] = None
-
-                item['page_type'] = PageType.PRODUCT
-                yield item
-                logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
-
-            except Exception as e:
-                logger.error(f"Error processing product card: {e}")
\ No newline at end of file
+            item['name'] = clean(card['name'])
+            item['product_link'] = response.urljoin(card['product_link']) if card['product_link'] else None
+            item['price'] = parse_price(card['price'])
+            item['image_urls'] = [response.urljoin(card['image_url'])] if card['image_url'] else []
+            item['colors'] = [color.strip() for color in card['colors']]
+
+            item['sizes'] = [] # Sizes are not available on the listing page
+            item['description'] = None
+
+            item['page_type'] = PageType.PRODUCT
+            yield item
+            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
@@ -1,9 +1,9 @@
 import json
 import logging
-import re
 
 import scrapy
 
+from clothing_scraper.extraction import clean, extract_cards_from_response, parse_price
 from clothing_scraper.items import ClothingItem
 from api.spiders import PageType
 from api.start_urls_enum import SpiderStartUrls
@@ -16,12 +16,23 @@ class CelioSpider(scrapy.Spider):
     allowed_domains = ["celio.com"]
 
     start_urls = SpiderStartUrls.CELIO.value
+    ready_selector = ".product-grid__item .product"
+
+    card_fields = {
+        "name": {"selector": ".product-tile__name", "prop": "innerText"},
+        "product_link": {"selector": "a.product-tile__name", "attr": "href"},
+        "image_url": {"selector": ".product-tile__image img.tile-image", "attr": "src"},
+        "price": {"selector": ".product-tile__price .value", "prop": "innerText"},
+        "colors": {"selector": ".color-swatches .swatches__item", "attr": "title", "many": True},
+    }
 
     custom_settings = {
+        # Plain HTTP first; pages DataDome blocks go through undetected_chromedriver
         'DOWNLOAD_HANDLERS': {
-            'http': 'clothing_scraper.downloaders_celio.UndetectedChromeDriverDownloadHandler',
-            'https': 'clothing_scraper.downloaders_celio.UndetectedChromeDriverDownloadHandler',
+            'http': 'clothing_scraper.downloaders_hybrid.HybridDownloadHandler',
+            'https': 'clothing_scraper.downloaders_hybrid.HybridDownloadHandler',
         },
+        'HYBRID_BROWSER_HANDLER': 'clothing_scraper.downloaders_celio.UndetectedChromeDriverDownloadHandler',
         'DOWNLOADER_MIDDLEWARES': {
             'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
             'clothing_scraper.middlewares.CaptchaMiddleware': 543,
@@ -36,6 +47,8 @@ class CelioSpider(scrapy.Spider):
             '--window-size=1920,1080',
         ],
         'DOWNLOAD_DELAY': 10,
+        # Drivers run on worker threads, so navigations overlap instead of blocking the reactor
+        'UC_DRIVER_POOL_SIZE': 2,
     }
 
     async def start(self):
@@ -52,57 +65,28 @@ class CelioSpider(scrapy.Spider):
         product_selector = ".product-grid__item .product"
         
         # No need to wait for selector with undetected_chromedriver, content is already loaded
-        products = response.css(product_selector)
+        cards = extract_cards_from_response(response, product_selector, self.card_fields)
 
-        if not products:
+        if not cards:
             logger.warning(f"No products found using selector '{product_selector}' on {response.url}.")
             return
 
-        logger.info(f"Found {len(products)} products on {response.url}.")
+        logger.info(f"Found {len(cards)} products on {response.url}.")
 
-        for product_element in products:
+        for card in cards:
             item = ClothingItem()
-
-            # Extract product name
-            name = product_element.css('.product-tile__name::text').get()
-
-            # Extract product link
-            product_link = product_element.css('a.product-tile__name::attr(href)').get()
+            name = clean(card["name"])
+            product_link = card["product_link"]
 
             if not name or not product_link:
                 logger.warning(f"Could not extract name ({name}) or product link ({product_link}) for product on {response.url}. Skipping item.")
                 continue # Skip this item if name or product_link is not found
 
-            item["name"] = name.strip()
-            item["product_link"] = response.urljoin(product_link) if product_link else None
-
-            # Extract image URLs
-            image_url = product_element.css('.product-tile__image img.tile-image::attr(src)').get()
-            item["image_urls"] = [response.urljoin(image_url)] if image_url else []
-
-            # Extract price
-            price_str = product_element.css('.product-tile__price .value::text').get()
-            if price_str:
-                try:
-                    price_match = re.search(r'(\d+[\.,]\d+)', price_str)
-                    if price_match:
-                        price_str = price_match.group(1).replace(',', '.').strip()
-                        item["price"] = float(price_str)
-                    else:
-                        item["price"] = None
-                except Exception as e:
-                    logger.warning(f"Could not extract price for {item.get('name', 'N/A')}: {e}")
-                    item["price"] = None
-            else:
-                item["price"] = None
-
-            # Extract colors
-            colors = []
-            for color_element in product_element.css('.color-swatches .swatches__item'):
-                color_name = color_element.css('::attr(title)').get()
-                if color_name:
-                    colors.append(color_name.strip())
-            item["colors"] = colors if colors else []
+            item["name"] = name
+            item["product_link"] = response.urljoin(product_link)
+            item["image_urls"] = [response.urljoin(card["image_url"])] if card["image_url"] else []
+            item["price"] = parse_price(card["price"])
+            item["colors"] = [color.strip() for color in card["colors"]]
 
             # Sizes are not available on the listing page
             item["sizes"] = []
@@ -111,4 +95,4 @@ class CelioSpider(scrapy.Spider):
             item["page_type"] = PageType.PRODUCT
 
             yield item
-            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
\ No newline at end of file
+            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
@@ -3,7 +3,9 @@ import logging
 
 import scrapy
 
+from clothing_scraper.extraction import clean, extract_cards, parse_price
 from clothing_scraper.items import ClothingItem
+from clothing_scraper.scrolling import scroll_spider_page
 from api.spiders import PageType
 from api.start_urls_enum import SpiderStartUrls
 
@@ -15,6 +17,15 @@ class NikeSpider(scrapy.Spider):
     allowed_domains = ["nike.com"]
 
     start_urls = SpiderStartUrls.NIKE.value
+    ready_selector = ".product-card"
+    total_count_selector = ".wall-header__item_count"
+
+    card_fields = {
+        "name": {"selector": ".product-card__title", "prop": "innerText"},
+        "product_link": {"selector": ".product-card__link-overlay", "prop": "href"},
+        "image_url": {"selector": ".product-card__hero-image", "prop": "src"},
+        "price": {"selector": ".product-price.is--current-price", "prop": "innerText"},
+    }
 
     async def parse(self, response):
         if response.status == 403 or "Access Denied" in response.text:
@@ -34,70 +45,22 @@ class NikeSpider(scrapy.Spider):
             )
             return
 
-        previous_product_count = 0
-        scroll_attempts = 0
-        max_scroll_attempts = 10  # Increased limit to prevent infinite loops
-
-        while True:
-            # Scroll to the bottom
-            await response.meta["page"].evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await response.meta["page"].waitFor(3000)  # Wait for new content to load
-
-            # Get the current number of products
-            current_products = await response.meta["page"].querySelectorAll(product_selector)
-            current_product_count = len(current_products)
+        await scroll_spider_page(response.meta["page"], product_selector, self, response.url)
 
-            if current_product_count == previous_product_count:
-                scroll_attempts += 1
-                if scroll_attempts > max_scroll_attempts:
-                    logger.info(f"Reached end of scrolling or max scroll attempts ({max_scroll_attempts}) on {response.url}.")
-                    break
-            else:
-                scroll_attempts = 0  # Reset counter if new content loaded
-            previous_product_count = current_product_count
+        cards = await extract_cards(response.meta["page"], product_selector, self.card_fields)
 
-        products = await response.meta["page"].querySelectorAll(product_selector)
-
-        if not products:
+        if not cards:
             logger.warning(f"No products found using selector '{product_selector}' on {response.url}.")
             return
 
-        logger.info(f"Found {len(products)} products on {response.url}.")
+        logger.info(f"Found {len(cards)} products on {response.url}.")
 
-        for product_element in products:
+        for card in cards:
             item = ClothingItem()
-
-            # Extract product name
-            name_element = await product_element.querySelector('.product-card__title')
-            item["name"] = (await (await name_element.getProperty('innerText')).jsonValue()).strip() if name_element else None
-
-            # Extract product link
-            product_link_element = await product_element.querySelector('.product-card__link-overlay')
-            product_link = await (await product_link_element.getProperty('href')).jsonValue() if product_link_element else None
-            item["product_link"] = response.urljoin(product_link) if product_link else None
-
-            # Extract image URLs
-            image_element = await product_element.querySelector('.product-card__hero-image')
-            image_url = await (await image_element.getProperty('src')).jsonValue() if image_element else None
-            item["image_urls"] = [response.urljoin(image_url)] if image_url else []
-
-            # Extract price
-            price_element = await product_element.querySelector('.product-price.is--current-price')
-            if price_element:
-                try:
-                    price_str = await (await price_element.getProperty('innerText')).jsonValue()
-                    import re
-                    price_match = re.search(r'(\d+[\.,]\d+)', price_str)
-                    if price_match:
-                        price_str = price_match.group(1).replace(',', '.').strip()
-                        item["price"] = float(price_str)
-                    else:
-                        item["price"] = None
-                except Exception as e:
-                    logger.warning(f"Could not extract price for {item.get('name', 'N/A')}: {e}")
-                    item["price"] = None
-            else:
-                item["price"] = None
+            item["name"] = clean(card["name"])
+            item["product_link"] = response.urljoin(card["product_link"]) if card["product_link"] else None
+            item["image_urls"] = [response.urljoin(card["image_url"])] if card["image_url"] else []
+            item["price"] = parse_price(card["price"])
 
             # Sizes and colors are typically on the product detail page, not the listing page.
             # For now, we'll leave them as empty lists or None.
@@ -107,4 +70,4 @@ class NikeSpider(scrapy.Spider):
             item["page_type"] = PageType.PRODUCT
 
             yield item
-            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
\ No newline at end of file
+            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
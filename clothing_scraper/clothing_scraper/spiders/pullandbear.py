@@ -3,9 +3,12 @@ import logging
 
 import scrapy
 
+from clothing_scraper.extraction import clean, extract_cards, parse_price
+from clothing_scraper.inditex import PRODUCT_FEED_PATTERNS, items_from_product_feed
 from clothing_scraper.items import (
     ClothingItem,  # Assuming ClothingItem is defined here or in items.py
 )
+from clothing_scraper.scrolling import scroll_spider_page
 from api.spiders import PageType
 from api.start_urls_enum import SpiderStartUrls
 
@@ -17,6 +20,20 @@ class PullandbearSpider(scrapy.Spider):
     allowed_domains = ["pullandbear.com"]
 
     start_urls = SpiderStartUrls.PULLANDBEAR.value
+    ready_selector = "legacy-product"
+    # The grid is filled from JSON catalogue calls; read those instead of the cards when we can
+    capture_xhr_patterns = PRODUCT_FEED_PATTERNS
+    # New pages of the grid are slow to arrive here
+    scroll_step_timeout = 5.0
+
+    card_fields = {
+        "name": {"selector": ".product-name", "prop": "innerText"},
+        "product_link": {"selector": ".carousel-item-container", "prop": "href"},
+        "image_urls": {"selector": ".carousel-item img", "prop": "src", "many": True},
+        "price": {"selector": ".price-container price-element", "prop": "innerText"},
+        "sizes": {"selector": ".c-quick-item--size input", "prop": "value", "many": True},
+        "colors": {"selector": ".item-color input", "prop": "title", "many": True},
+    }
 
     async def start(self):
         for url in self.start_urls:
@@ -40,98 +57,39 @@ class PullandbearSpider(scrapy.Spider):
             )
             return
 
-        # Scroll down to load all products
-        previous_product_count = 0
-        scroll_attempts = 0
-        max_scroll_attempts = 20 # Increased limit to prevent infinite loops
-
-        while True:
-            # Scroll to the bottom
-            await response.meta["page"].evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await response.meta["page"].waitFor(7000)  # Increased wait time for new content to load
-
-            # Get the current number of products
-            current_products = await response.meta["page"].querySelectorAll(product_selector)
-            current_product_count = len(current_products)
-
-            if current_product_count == previous_product_count:
-                scroll_attempts += 1
-                if scroll_attempts > max_scroll_attempts:
-                    logger.info(f"Reached end of scrolling or max scroll attempts ({max_scroll_attempts}) on {response.url}.")
-                    break
-            else:
-                scroll_attempts = 0 # Reset counter if new content loaded
-            previous_product_count = current_product_count
-
-        # Select all product containers using Pyppeteer (after all scrolling attempts)
-        products = await response.meta["page"].querySelectorAll(product_selector)
-
-        if not products:
+        await scroll_spider_page(response.meta["page"], product_selector, self, response.url)
+
+        capture = response.meta.get("xhr_capture")
+        if capture is not None:
+            feed_items = list(items_from_product_feed(await capture.collect(), response.url))
+            if feed_items:
+                logger.info(f"Found {len(feed_items)} products in the captured product feed on {response.url}.")
+                for item in feed_items:
+                    yield item
+                    logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
+                return
+            logger.info(f"No usable product feed captured on {response.url}, falling back to the DOM.")
+
+        # Read every product card in one round-trip (after all scrolling attempts)
+        cards = await extract_cards(response.meta["page"], product_selector, self.card_fields)
+
+        if not cards:
             logger.warning(f"No products found using selector '{product_selector}' on {response.url}.")
             return
 
-        logger.info(f"Found {len(products)} products on {response.url}.")
+        logger.info(f"Found {len(cards)} products on {response.url}.")
 
-        for product_element in products:
+        for card in cards:
             item = ClothingItem()
-
-            # Extract product name
-            name_element = await product_element.querySelector('.product-name')
-            item["name"] = (await (await name_element.getProperty('innerText')).jsonValue()).strip() if name_element else None
-
-            # Extract product link
-            product_link_element = await product_element.querySelector('.carousel-item-container')
-            product_link = await (await product_link_element.getProperty('href')).jsonValue() if product_link_element else None
-            item["product_link"] = response.urljoin(product_link) if product_link else None
-
-            # Extract image URLs
-            image_elements = await product_element.querySelectorAll('.carousel-item img')
-            image_urls = []
-            for img_element in image_elements:
-                src = await (await img_element.getProperty('src')).jsonValue()
-                if src:
-                    image_urls.append(response.urljoin(src))
-            item["image_urls"] = image_urls if image_urls else []
-
-            # Extract price using page.evaluate on the specific product element
-            price_element = await product_element.querySelector('.price-container price-element')
-            if price_element:
-                try:
-                    # Get innerHTML of the price-element
-                    price_html = await (await price_element.getProperty('innerHTML')).jsonValue()
-                    import re
-                    price_match = re.search(r'(\d+[\.,]\d+)', price_html)
-                    if price_match:
-                        price_str = price_match.group(1).replace(',', '.').strip()
-                        item["price"] = float(price_str)
-                    else:
-                        item["price"] = None
-                except Exception as e:
-                    logger.warning(f"Could not extract price for {item.get('name', 'N/A')}: {e}")
-                    item["price"] = None
-            else:
-                item["price"] = None
-
-            # Extract sizes
-            size_elements = await product_element.querySelectorAll('.c-quick-item--size input')
-            sizes = []
-            for size_element in size_elements:
-                value = await (await size_element.getProperty('value')).jsonValue()
-                if value:
-                    sizes.append(value)
-            item["sizes"] = sizes if sizes else []
-
-            # Extract colors
-            color_elements = await product_element.querySelectorAll('.item-color input')
-            colors = []
-            for color_element in color_elements:
-                title = await (await color_element.getProperty('title')).jsonValue()
-                if title:
-                    colors.append(title)
-            item["colors"] = colors if colors else []
+            item["name"] = clean(card["name"])
+            item["product_link"] = response.urljoin(card["product_link"]) if card["product_link"] else None
+            item["image_urls"] = [response.urljoin(src) for src in card["image_urls"]]
+            item["price"] = parse_price(card["price"])
+            item["sizes"] = card["sizes"]
+            item["colors"] = card["colors"]
 
             item["description"] = None # Description is not in this HTML snippet
             item["page_type"] = PageType.PRODUCT
 
             yield item
-            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
\ No newline at end of file
+            logger.info(f"  -> Processed product: {item.get('name', 'N/A')}")
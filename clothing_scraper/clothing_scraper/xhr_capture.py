@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_RESOURCE_TYPES = ('xhr', 'fetch')
+
+
+class ResponseCapture:
+    """Records JSON bodies of XHR/fetch responses whose URL matches the spider's patterns.
+
+    Spiders opt in with a ``capture_xhr_patterns`` list of regexes. The handler
+    starts the capture before navigating and exposes it as
+    ``response.meta['xhr_capture']``; it keeps recording while the spider
+    scrolls, until the page goes back to the pool. ``await capture.collect()``
+    waits for bodies still being read and returns ``[{'url': ..., 'data': ...}]``.
+    """
+
+    def __init__(self, page, url_patterns, stats=None):
+        self.page = page
+        self.url_pattern = re.compile('|'.join(url_patterns))
+        self.stats = stats
+        self.payloads = []
+        self._pending = set()
+
+    def _inc(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(f'xhr_capture/{key}', count)
+
+    def start(self):
+        self.page.on('response', self._on_response)
+        return self
+
+    def stop(self):
+        self.page.remove_listener('response', self._on_response)
+
+    def _on_response(self, response):
+        if response.request.resourceType not in CAPTURED_RESOURCE_TYPES:
+            return
+        if not self.url_pattern.search(response.url):
+            return
+        task = asyncio.ensure_future(self._read(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _read(self, response):
+        try:
+            data = await response.json()
+        except Exception as e:
+            # Body evicted by a navigation, or not JSON after all
+            self._inc('errors')
+            logger.debug(f"Could not read captured response {response.url}: {e}")
+            return
+        self._inc('responses')
+        self.payloads.append({'url': response.url, 'data': data})
+
+    async def collect(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        return self.payloads
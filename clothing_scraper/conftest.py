@@ -0,0 +1 @@
+# Puts the project root on sys.path so tests can import api, database and clothing_scraper
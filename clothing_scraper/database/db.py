@@ -1,17 +1,77 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import yaml
-import os
+
+from database.hashing import compute_content_hash
 
 # Get the absolute path of the project's root directory
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(PROJECT_ROOT, 'database', 'migrations')
 
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database using credentials from config.yaml."""
+# Environment variables take precedence over config.yaml
+ENV_OVERRIDES = {
+    'host': 'DB_HOST',
+    'port': 'DB_PORT',
+    'user': 'DB_USER',
+    'password': 'DB_PASSWORD',
+    'dbname': 'DB_NAME',
+}
+
+# Matches on the French tsvector, or on a trigram word match against the name so
+# that typos still hit; both sides are index-backed (see schema.sql)
+SEARCH_PRODUCTS_SQL = """
+    SELECT id, name, description, price, sizes, colors, image_urls, product_link, scraped_at,
+           ts_rank_cd(search_vector, query) + word_similarity(%(q)s, name) AS rank
+    FROM products, websearch_to_tsquery('french', %(q)s) AS query
+    WHERE search_vector @@ query OR %(q)s <%% name
+    ORDER BY rank DESC, id DESC
+    OFFSET %(skip)s LIMIT %(limit)s;
+"""
+
+# Column types for the VALUES lists of bulk updates, where PostgreSQL can't infer them
+PRODUCT_COLUMN_TYPES = {
+    'name': 'varchar',
+    'description': 'text',
+    'price': 'real',
+    'sizes': 'text[]',
+    'colors': 'text[]',
+    'image_urls': 'text[]',
+    'product_link': 'varchar',
+}
+
+# Placeholder for update_scrape_job: set the column to the server's current time
+SQL_NOW = object()
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+_last_used = {}
+
+@functools.lru_cache(maxsize=None)
+def load_config():
+    """Reads config.yaml once per process."""
     config_path = os.path.join(PROJECT_ROOT, 'config.yaml')
     with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-    db_config = config['database']
+        return yaml.safe_load(f)
+
+def get_db_settings():
+    db_config = dict(load_config()['database'])
+    for key, env_var in ENV_OVERRIDES.items():
+        if os.environ.get(env_var):
+            db_config[key] = os.environ[env_var]
+    return db_config
+
+def get_db_connection():
+    """Opens a new, unpooled connection. Prefer get_connection() for short-lived work."""
+    db_config = get_db_settings()
     conn = psycopg2.connect(
         host=db_config['host'],
         port=db_config['port'],
@@ -21,8 +81,100 @@ def get_db_connection():
     )
     return conn
 
+class _TrackedConnectionPool(ThreadedConnectionPool):
+    """Notes when each connection is opened, so a fresh one isn't health-checked on first use."""
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        _last_used[id(conn)] = time.monotonic()
+        return conn
+
+def get_pool():
+    """The process-wide connection pool, created on first use.
+
+    Sized by the ``pool`` section of config.yaml, overridable with
+    DB_POOL_MIN / DB_POOL_MAX.
+    """
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_config = get_db_settings()
+                pool_config = load_config().get('pool', {})
+                minconn = int(os.environ.get('DB_POOL_MIN', pool_config.get('min', 1)))
+                maxconn = int(os.environ.get('DB_POOL_MAX', pool_config.get('max', 10)))
+                _pool = _TrackedConnectionPool(
+                    minconn,
+                    maxconn,
+                    host=db_config['host'],
+                    port=db_config['port'],
+                    user=db_config['user'],
+                    password=db_config['password'],
+                    dbname=db_config['dbname'],
+                )
+                # ThreadedConnectionPool raises when exhausted; make callers wait instead
+                _pool_slots = threading.BoundedSemaphore(maxconn)
+    return _pool
+
+def close_pool():
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = None
+        _pool_slots = None
+        _last_used.clear()
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    idle_for = time.monotonic() - _last_used.get(id(conn), time.monotonic())
+    if idle_for < float(load_config().get('pool', {}).get('healthcheck_after', 30)):
+        return True
+    # Idle long enough that the server or a proxy may have dropped it
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+@contextmanager
+def get_connection():
+    """Leases a pooled connection for the duration of the block."""
+    pool = get_pool()
+    slots = _pool_slots
+    slots.acquire()
+    try:
+        conn = pool.getconn()
+        # A replacement may be another stale idle connection; only a new one is known good
+        while not _is_healthy(conn):
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+    except Exception:
+        slots.release()
+        raise
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        close = broken or bool(conn.closed)
+        if close:
+            _last_used.pop(id(conn), None)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=close)
+        slots.release()
+
 def create_tables():
-    """Creates the database tables based on the schema.sql file."""
+    """Creates the database tables based on the schema.sql file, then applies pending migrations."""
     conn = get_db_connection()
     cur = conn.cursor()
     schema_path = os.path.join(PROJECT_ROOT, 'database', 'schema.sql')
@@ -30,111 +182,410 @@ def create_tables():
         cur.execute(f.read())
     conn.commit()
     cur.close()
+    apply_migrations(conn)
     conn.close()
 
-def create_product(product: dict):
-    conn = get_db_connection()
+def apply_migrations(conn):
+    """Runs each database/migrations/*.sql not yet recorded in schema_migrations, in filename order.
+
+    Every migration commits on its own, so a failure leaves the earlier ones applied.
+    Returns the names of the migrations that ran.
+    """
     cur = conn.cursor()
     try:
-        sql = """
-            INSERT INTO products (name, description, price, sizes, colors, image_urls, product_link)
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id;
-        """
-        cur.execute(sql, (
-            product.get('name'),
-            product.get('description'),
-            product.get('price'),
-            product.get('sizes'),
-            product.get('colors'),
-            product.get('image_urls'),
-            product.get('product_link')
-        ))
-        product_id = cur.fetchone()[0]
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cur.execute("SELECT name FROM schema_migrations;")
+        applied = {row[0] for row in cur.fetchall()}
         conn.commit()
-        return {**product, "id": product_id}
-    except Exception as e:
+
+        ran = []
+        for name in sorted(os.listdir(MIGRATIONS_DIR)):
+            if not name.endswith('.sql') or name in applied:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, name), 'r') as f:
+                cur.execute(f.read())
+            cur.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (name,))
+            conn.commit()
+            ran.append(name)
+        return ran
+    except Exception:
         conn.rollback()
-        raise e
+        raise
     finally:
         cur.close()
-        conn.close()
+
+def _product_filters(min_price=None, max_price=None, sizes=None, colors=None):
+    """WHERE conditions and their parameters for the attribute filters of GET /products/."""
+    conditions = []
+    params = []
+    if min_price is not None:
+        conditions.append("price >= %s")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("price <= %s")
+        params.append(max_price)
+    # Containment, ignoring case: a product must offer every requested size / color.
+    # lower_text_array (migration 001) is what the GIN indexes are built on
+    if sizes:
+        conditions.append("lower_text_array(sizes) @> %s::text[]")
+        params.append([size.lower() for size in sizes])
+    if colors:
+        conditions.append("lower_text_array(colors) @> %s::text[]")
+        params.append([color.lower() for color in colors])
+    return conditions, params
+
+def create_product(product: dict):
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            sql = """
+                INSERT INTO products (name, description, price, sizes, colors, image_urls, product_link, content_hash)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id;
+            """
+            cur.execute(sql, (
+                product.get('name'),
+                product.get('description'),
+                product.get('price'),
+                product.get('sizes'),
+                product.get('colors'),
+                product.get('image_urls'),
+                product.get('product_link'),
+                compute_content_hash(product),
+            ))
+            product_id = cur.fetchone()[0]
+            conn.commit()
+            return {**product, "id": product_id}
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
 
 def get_product(product_id: int):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM products WHERE id = %s;", (product_id,))
-        return cur.fetchone()
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute("SELECT * FROM products WHERE id = %s;", (product_id,))
+            return cur.fetchone()
+        finally:
+            cur.close()
 
-def get_products(skip: int = 0, limit: int = 100):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute("SELECT * FROM products OFFSET %s LIMIT %s;", (skip, limit,))
-        return cur.fetchall()
-    finally:
-        cur.close()
-        conn.close()
+def get_products(skip: int = 0, limit: int = 100, **filters):
+    conditions, params = _product_filters(**filters)
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            # Ordered so that pages are stable between calls
+            cur.execute(f"SELECT * FROM products {where}ORDER BY id OFFSET %s LIMIT %s;", (*params, skip, limit))
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+def get_products_page(after_scraped_at=None, after_id=None, limit: int = 100, **filters):
+    """Keyset pagination, newest first: rows strictly after the (scraped_at, id) of the previous page's last row.
+
+    Served by products_scraped_at_id_idx, so every page costs the same however deep it is.
+    Takes the same attribute filters as get_products.
+    """
+    conditions, params = _product_filters(**filters)
+    if after_id is not None and after_scraped_at is None:
+        # NULLs sort first in descending order: the rest of them, then every dated row
+        conditions.append("(scraped_at IS NULL AND id < %s OR scraped_at IS NOT NULL)")
+        params.append(after_id)
+    elif after_id is not None:
+        conditions.append("(scraped_at, id) < (%s, %s)")
+        params.extend([after_scraped_at, after_id])
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute(
+                f"SELECT * FROM products {where}ORDER BY scraped_at DESC, id DESC LIMIT %s;",
+                (*params, limit),
+            )
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+def search_products(q: str, skip: int = 0, limit: int = 20):
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute(SEARCH_PRODUCTS_SQL, {'q': q, 'skip': skip, 'limit': limit})
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+def iter_products(columns, chunk_size: int = 1000):
+    """Yields every product, in id order, as lists of at most ``chunk_size`` rows.
+
+    Rows come from a named (server-side) cursor, so only one chunk is held in
+    memory at a time. The pooled connection stays leased until the generator
+    is exhausted or closed.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor(name='products_export', cursor_factory=RealDictCursor)
+        cur.itersize = chunk_size
+        try:
+            cur.execute(f"SELECT {', '.join(columns)} FROM products ORDER BY id;")
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+def _forget_crawl_state(cur, product_ids):
+    """Readies products edited through the API to be rewritten by the next crawl.
+
+    The crawler only rewrites a row whose content hash differs from the scraped one, and
+    DeltaCrawlMiddleware drops items whose fingerprint is unchanged; an edit touches neither,
+    so both are cleared. Call before the UPDATE, so that a changed product_link's old
+    fingerprint goes too.
+    """
+    cur.execute(
+        """
+        DELETE FROM product_fingerprints
+        WHERE product_link IN (SELECT product_link FROM products WHERE id = ANY(%s));
+        """,
+        (list(product_ids),),
+    )
 
 def update_product(product_id: int, product: dict):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Build SET clause dynamically
-        set_clauses = []
-        values = []
-        for key, value in product.items():
-            set_clauses.append(f"{key} = %s")
-            values.append(value)
-        
-        if not set_clauses:
-            return None # No fields to update
-
-        sql = f"UPDATE products SET {". ".join(set_clauses)} WHERE id = %s RETURNING id;"
-        values.append(product_id)
-        
-        cur.execute(sql, tuple(values))
-        updated_id = cur.fetchone()
-        conn.commit()
-        return updated_id[0] if updated_id else None
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+    # Build SET clause dynamically
+    set_clauses = []
+    values = []
+    for key, value in product.items():
+        set_clauses.append(f"{key} = %s")
+        values.append(value)
+
+    if not set_clauses:
+        return None # No fields to update
+
+    # The stored hash no longer describes the row; see _forget_crawl_state
+    set_clauses.append("content_hash = NULL")
+    sql = f"UPDATE products SET {', '.join(set_clauses)} WHERE id = %s RETURNING id;"
+    values.append(product_id)
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            _forget_crawl_state(cur, [product_id])
+            cur.execute(sql, tuple(values))
+            updated_id = cur.fetchone()
+            conn.commit()
+            return updated_id[0] if updated_id else None
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
 
 def delete_product(product_id: int):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM products WHERE id = %s RETURNING id;", (product_id,))
-        deleted_id = cur.fetchone()
-        conn.commit()
-        return deleted_id[0] if deleted_id else None
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM products WHERE id = %s RETURNING id;", (product_id,))
+            deleted_id = cur.fetchone()
+            conn.commit()
+            return deleted_id[0] if deleted_id else None
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+def create_products(products: list):
+    """Inserts many products with one statement and one commit.
+
+    Returns one id per input product, in order; None where the product_link
+    already existed (or repeats an earlier row of the batch).
+    """
+    if not products:
+        return []
+    columns = list(PRODUCT_COLUMN_TYPES) + ['content_hash']
+    rows = [
+        tuple(product.get(column) for column in PRODUCT_COLUMN_TYPES) + (compute_content_hash(product),)
+        for product in products
+    ]
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            inserted = execute_values(
+                cur,
+                f"""
+                INSERT INTO products ({', '.join(columns)}) VALUES %s
+                ON CONFLICT (product_link) DO NOTHING
+                RETURNING id, product_link;
+                """,
+                rows,
+                page_size=len(rows),
+                fetch=True,
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+    ids = {product_link: product_id for product_id, product_link in inserted}
+    return [ids.pop(product.get('product_link'), None) for product in products]
+
+def update_products(products: list):
+    """Applies many partial updates in one transaction; each dict carries its 'id'.
+
+    Rows that set the same fields share one UPDATE ... FROM (VALUES ...) statement.
+    Returns the set of ids that existed and were updated.
+    """
+    groups = {}
+    for product in products:
+        fields = tuple(sorted(key for key in product if key != 'id'))
+        if fields:
+            groups.setdefault(fields, []).append(product)
+
+    updated = set()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            _forget_crawl_state(cur, [product['id'] for group in groups.values() for product in group])
+            for fields, group in groups.items():
+                template = "(%s::integer, " + ", ".join(f"%s::{PRODUCT_COLUMN_TYPES[f]}" for f in fields) + ")"
+                rows = [(product['id'], *(product[f] for f in fields)) for product in group]
+                returned = execute_values(
+                    cur,
+                    f"""
+                    UPDATE products AS p SET {', '.join(f'{f} = v.{f}' for f in fields)}, content_hash = NULL
+                    FROM (VALUES %s) AS v (id, {', '.join(fields)})
+                    WHERE p.id = v.id
+                    RETURNING p.id;
+                    """,
+                    rows,
+                    template=template,
+                    page_size=len(rows),
+                    fetch=True,
+                )
+                updated.update(row[0] for row in returned)
+            conn.commit()
+            return updated
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+def delete_products(product_ids: list):
+    """Deletes many products with one statement; returns the set of ids that existed."""
+    if not product_ids:
+        return set()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM products WHERE id = ANY(%s) RETURNING id;", (list(product_ids),))
+            deleted = {row[0] for row in cur.fetchall()}
+            conn.commit()
+            return deleted
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
 
 def delete_all_products():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM products;")
-        conn.commit()
-        return {"message": "All products deleted successfully"}
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM products;")
+            conn.commit()
+            return {"message": "All products deleted successfully"}
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+def create_scrape_job(spider: str):
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute("INSERT INTO scrape_jobs (spider) VALUES (%s) RETURNING *;", (spider,))
+            job = cur.fetchone()
+            conn.commit()
+            return job
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+def get_scrape_job(job_id: int):
+    with get_connection() as conn:
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute("SELECT * FROM scrape_jobs WHERE id = %s;", (job_id,))
+            return cur.fetchone()
+        finally:
+            cur.close()
+
+def update_scrape_job(job_id: int, only_if_status=None, **fields):
+    """Sets the given columns; values may be SQL_NOW to stamp the current time.
+
+    With ``only_if_status``, only a job currently in that status is updated.
+    Returns whether a row was updated.
+    """
+    set_clauses = ["updated_at = CURRENT_TIMESTAMP"]
+    values = []
+    for key, value in fields.items():
+        if value is SQL_NOW:
+            set_clauses.append(f"{key} = CURRENT_TIMESTAMP")
+        else:
+            set_clauses.append(f"{key} = %s")
+            values.append(value)
+    values.append(job_id)
+    where = "id = %s"
+    if only_if_status is not None:
+        where += " AND status = %s"
+        values.append(only_if_status)
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"UPDATE scrape_jobs SET {', '.join(set_clauses)} WHERE {where};", tuple(values))
+            conn.commit()
+            return cur.rowcount > 0
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+def fail_unfinished_scrape_jobs(error: str):
+    """Marks queued and running jobs as failed; for jobs left behind by an API process that went away."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE scrape_jobs
+                SET status = 'failed', error = %s, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE status IN ('queued', 'running', 'cancelling');
+                """,
+                (error,),
+            )
+            count = cur.rowcount
+            conn.commit()
+            return count
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cur.close()
 
 if __name__ == '__main__':
     print("Creating database tables...")
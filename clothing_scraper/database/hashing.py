@@ -0,0 +1,22 @@
+import hashlib
+import json
+
+def _normalize_text(value):
+    return " ".join(value.split()) if isinstance(value, str) else value
+
+def compute_content_hash(item):
+    """SHA-256 over the fields we store, normalized so cosmetic differences don't count as changes.
+
+    Shared by the crawl pipeline and the API's create paths, so both dedupe the same way.
+    """
+    price = item.get("price")
+    normalized = {
+        "name": _normalize_text(item.get("name")),
+        "description": _normalize_text(item.get("description")),
+        "price": round(float(price), 2) if price is not None else None,
+        "sizes": sorted(_normalize_text(s) for s in item.get("sizes") or []),
+        "colors": sorted(_normalize_text(c).lower() for c in item.get("colors") or []),
+        "image_urls": sorted(item.get("image_urls") or []),
+        "product_link": item.get("product_link"),
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
@@ -0,0 +1,15 @@
+-- Attribute filters on GET /products/ (min_price, max_price, sizes, colors).
+-- @> containment on the TEXT[] columns is served by GIN; price ranges by btree.
+-- The index leads on price, so it doesn't give the default ORDER BY id: the rows
+-- in the price range are sorted afterwards.
+--
+-- Size and color filters ignore case: sites write "Noir" or "NOIR" and clients ask
+-- for noir. Both sides are lower-cased, the column side through this function so
+-- that the GIN indexes can be built on its result.
+CREATE OR REPLACE FUNCTION lower_text_array(text[]) RETURNS text[]
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT coalesce(array_agg(lower(value) ORDER BY position), '{}') FROM unnest($1) WITH ORDINALITY AS t(value, position) $$;
+
+CREATE INDEX IF NOT EXISTS products_sizes_lower_gin_idx ON products USING GIN (lower_text_array(sizes));
+CREATE INDEX IF NOT EXISTS products_colors_lower_gin_idx ON products USING GIN (lower_text_array(colors));
+CREATE INDEX IF NOT EXISTS products_price_id_idx ON products (price, id);
@@ -0,0 +1,17 @@
+-- Crawl jobs started through POST /scrape/{spider_name}; see api/jobs.py
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id SERIAL PRIMARY KEY,
+    spider VARCHAR(64) NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    pid INTEGER,
+    items_scraped INTEGER NOT NULL DEFAULT 0,
+    pages_crawled INTEGER NOT NULL DEFAULT 0,
+    finish_reason TEXT,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS scrape_jobs_status_idx ON scrape_jobs (status);
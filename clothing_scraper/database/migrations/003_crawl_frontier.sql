@@ -0,0 +1,22 @@
+-- Shared crawl frontier for clothing_scraper.frontier.PostgresFrontier. Rows are leased
+-- with FOR UPDATE SKIP LOCKED; a lease that outlives leased_until goes back to the queue.
+-- The unique constraint is the crawl-wide dedupe set.
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    id BIGSERIAL PRIMARY KEY,
+    crawl_id VARCHAR(128) NOT NULL,
+    fingerprint VARCHAR(128) NOT NULL,
+    url TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    request BYTEA NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_by TEXT,
+    leased_until TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (crawl_id, fingerprint)
+);
+
+-- Only unfinished rows are ever scanned for leasing
+CREATE INDEX IF NOT EXISTS crawl_frontier_pending_idx
+    ON crawl_frontier (crawl_id, priority DESC, id)
+    WHERE status IN ('queued', 'leased');
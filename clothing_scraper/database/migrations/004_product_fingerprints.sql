@@ -0,0 +1,13 @@
+-- What each crawl last saw of a product, for DeltaCrawlMiddleware: rows seen within the
+-- freshness window with an unchanged content hash are skipped by the next crawl.
+-- Upserted by the pipeline's DatabaseWriter alongside products.
+CREATE TABLE IF NOT EXISTS product_fingerprints (
+    product_link VARCHAR(512) PRIMARY KEY,
+    content_hash CHAR(64),
+    category_url TEXT,
+    last_seen_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The middleware preloads everything seen since now() - window
+CREATE INDEX IF NOT EXISTS product_fingerprints_last_seen_at_idx ON product_fingerprints (last_seen_at);
@@ -7,5 +7,22 @@ CREATE TABLE IF NOT EXISTS products (
     colors TEXT[],
     image_urls TEXT[],
     product_link VARCHAR(512) UNIQUE NOT NULL,
-    scraped_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+    scraped_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    content_hash CHAR(64)
+);
+
+-- Databases created before content hashing
+ALTER TABLE products ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+-- Keyset pagination for GET /products/?cursor=
+CREATE INDEX IF NOT EXISTS products_scraped_at_id_idx ON products (scraped_at DESC, id DESC);
+
+-- Full-text and fuzzy search for GET /products/search. The generated column is
+-- recomputed by PostgreSQL on every insert/update, from the pipeline or the API
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('french', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('french', coalesce(description, '')), 'B')
+) STORED;
+CREATE INDEX IF NOT EXISTS products_search_vector_idx ON products USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS products_name_trgm_idx ON products USING GIN (name gin_trgm_ops);
@@ -11,14 +11,50 @@ from scrapy.utils.project import get_project_settings
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, PROJECT_ROOT)
 
-from api.spiders import SpiderName
-from clothing_scraper.spiders.bershka import BershkaSpider
-from clothing_scraper.spiders.celio import CelioSpider
-from clothing_scraper.spiders.canda import CandaSpider
-from clothing_scraper.spiders.nike import NikeSpider
-from clothing_scraper.spiders.pullandbear import PullandbearSpider
+from clothing_scraper import registry
 from database.db import create_tables
 
+# Stats summed across crawlers for the report printed after a multi-spider crawl
+REPORT_STATS = [
+    ("items", "item_scraped_count"),
+    ("pages", "response_received_count"),
+    ("errors", "log_count/ERROR"),
+    ("inserted", "db/inserted"),
+    ("changed", "db/changed"),
+    ("unchanged", "db/unchanged"),
+]
+
+
+def parse_spiders(value):
+    """--spider all, or a comma-separated list of registered spider names."""
+    if value == "all":
+        return list(registry.SPIDERS)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if not registry.is_registered(name)]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"No spider registered for {', '.join(unknown)} (choose from: all, {', '.join(registry.SPIDERS)})"
+        )
+    return names
+
+
+def print_stats_report(crawlers):
+    print(f"\n{'spider':<14} {'seconds':>8} " + " ".join(f"{label:>9}" for label, _ in REPORT_STATS) + "  finish reason")
+    totals = {key: 0 for _, key in REPORT_STATS}
+    for crawler in crawlers:
+        stats = crawler.stats.get_stats()
+        row = []
+        for _, key in REPORT_STATS:
+            value = stats.get(key, 0)
+            totals[key] += value
+            row.append(f"{value:>9}")
+        print(
+            f"{crawler.spidercls.name:<14} {stats.get('elapsed_time_seconds', 0):>8.0f} "
+            + " ".join(row)
+            + f"  {stats.get('finish_reason', '-')}"
+        )
+    print(f"{'total':<14} {'':>8} " + " ".join(f"{totals[key]:>9}" for _, key in REPORT_STATS))
+
 
 def main():
     parser = argparse.ArgumentParser(description="Clothing Scraper and API")
@@ -27,9 +63,8 @@ def main():
     )
     parser.add_argument(
         "--spider",
-        type=SpiderName,
-        choices=list(SpiderName),
-        help="Specify which spider to run (e.g., pullandbear, hm)",
+        type=parse_spiders,
+        help="Spider to run: a name (e.g. pullandbear), a comma-separated list, or all",
     )
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     args = parser.parse_args()
@@ -49,23 +84,21 @@ def main():
         print("Database setup complete.")
     elif args.action == "scrape":
         print("Starting the scraper...")
-        process = CrawlerProcess(get_project_settings())
-        if args.spider == SpiderName.PULLANDBEAR:
-            process.crawl(PullandbearSpider)
-        elif args.spider == SpiderName.CANDA:
-            process.crawl(CandaSpider)
-        elif args.spider == SpiderName.NIKE:
-            process.crawl(NikeSpider)
-        elif args.spider == SpiderName.BERSHKA:
-            process.crawl(BershkaSpider)
-        elif args.spider == SpiderName.CELIO:
-            process.crawl(CelioSpider)
-        else:
+        if not args.spider:
             print(
-                "Please specify a spider to run using --spider (e.g., --spider pullandbear or --spider hm)"
+                "Please specify a spider to run using --spider (e.g., --spider pullandbear, --spider nike,celio or --spider all)"
             )
             return
+        # All spiders share one reactor; browsers and the DB writer are shared where settings match
+        process = CrawlerProcess(get_project_settings())
+        crawlers = []
+        for name in args.spider:
+            crawler = process.create_crawler(registry.get_spider_class(name))
+            crawlers.append(crawler)
+            process.crawl(crawler)
         process.start()
+        if len(crawlers) > 1:
+            print_stats_report(crawlers)
         print("Scraping complete.")
     elif args.action == "api":
         print("Starting the API...")
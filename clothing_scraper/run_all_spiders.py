@@ -1,30 +1,152 @@
-import subprocess
-import sys
+import argparse
+import asyncio
 import os
+import re
+import sys
+import time
 
 # Add the project root to the Python path to allow for absolute imports
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, PROJECT_ROOT)
 
 from api.spiders import SpiderName
+from clothing_scraper.registry import is_registered
+
+# A browser-driven crawl (Chromium plus Scrapy) typically settles around this much RSS
+DEFAULT_MEMORY_PER_SPIDER_MB = 1500
+
+# asyncio's default 64 KiB line limit is too small for Scrapy's stats dumps and tracebacks
+STREAM_LIMIT = 16 * 1024 * 1024
+
+# From the stats dump Scrapy logs when a spider closes
+ITEM_COUNT_RE = re.compile(r"'item_scraped_count':\s*(\d+)")
+
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo, or None where that isn't readable."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_parallelism(memory_per_spider_mb):
+    """One spider per CPU, fewer if the available memory can't hold that many."""
+    limit = os.cpu_count() or 1
+    memory = available_memory_mb()
+    if memory is not None:
+        limit = min(limit, memory // memory_per_spider_mb)
+    return max(1, limit)
+
+
+class SpiderRun:
+    def __init__(self, name):
+        self.name = name
+        self.duration = 0.0
+        self.items = None
+        self.returncode = None
+
+
+async def relay_output(run, stream):
+    """Prints the child's output line by line as it comes instead of buffering the whole run."""
+    while True:
+        try:
+            raw_line = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            raw_line = e.partial  # Last line, without a newline
+        except asyncio.LimitOverrunError as e:
+            # A line longer than STREAM_LIMIT: relay it in pieces rather than dying on it
+            raw_line = await stream.read(e.consumed)
+        if not raw_line:
+            return
+        line = raw_line.decode(errors="replace").rstrip()
+        print(f"[{run.name}] {line}", flush=True)
+        match = ITEM_COUNT_RE.search(line)
+        if match:
+            run.items = int(match.group(1))
+
 
-def run_all_spiders():
-    print("Starting execution of all spiders...")
-    for spider in SpiderName:
-        spider_name = spider.value
-        print(f"\n--- Running spider: {spider_name} ---")
-        command = ["python", "main.py", "scrape", "--spider", spider_name]
+async def run_spider(run, semaphore):
+    async with semaphore:
+        print(f"[{run.name}] starting", flush=True)
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", "scrape", "--spider", run.name,
+            cwd=PROJECT_ROOT,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=STREAM_LIMIT,
+        )
         try:
-            # Run the command and capture output
-            process = subprocess.run(command, capture_output=True, text=True, check=True)
-            print(process.stdout)
-            if process.stderr:
-                print(f"Error output for {spider_name}:\n{process.stderr}")
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed for {spider_name} with exit code {e.returncode}:\n{e.stdout}\n{e.stderr}")
-        except Exception as e:
-            print(f"An unexpected error occurred while running {spider_name}: {e}")
-    print("\nAll spiders execution finished.")
+            await relay_output(run, process.stdout)
+            await process.wait()
+        finally:
+            # Relaying failed or was cancelled: don't leave the crawl running unattended
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        run.returncode = process.returncode
+        run.duration = time.monotonic() - started
+        print(f"[{run.name}] exited with code {run.returncode} after {run.duration:.0f}s", flush=True)
+
+
+def print_summary(runs, skipped):
+    print("\nSummary:")
+    print(f"{'spider':<14} {'duration':>10} {'items':>8} {'exit':>6}")
+    for run in runs:
+        items = run.items if run.items is not None else "-"
+        returncode = run.returncode if run.returncode is not None else "-"
+        print(f"{run.name:<14} {run.duration:>9.0f}s {items:>8} {returncode:>6}")
+    if skipped:
+        print(f"Skipped (no spider registered): {', '.join(skipped)}")
+
+
+async def run_all_spiders(names, max_parallel):
+    runs = [SpiderRun(name) for name in names]
+    print(f"Running {len(runs)} spiders, {max_parallel} at a time...")
+    semaphore = asyncio.Semaphore(max_parallel)
+    # One runner failing mustn't orphan the others; each is reported in the summary instead
+    results = await asyncio.gather(*(run_spider(run, semaphore) for run in runs), return_exceptions=True)
+    for run, result in zip(runs, results):
+        if isinstance(result, Exception):
+            print(f"[{run.name}] runner failed: {result!r}", flush=True)
+    return runs
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every registered spider, several at a time")
+    parser.add_argument("--spiders", help="Comma-separated subset of spiders to run (default: all)")
+    parser.add_argument(
+        "--max-parallel", type=positive_int, help="Spiders to run at once (default: from CPUs and memory)"
+    )
+    parser.add_argument(
+        "--memory-per-spider-mb",
+        type=positive_int,
+        default=DEFAULT_MEMORY_PER_SPIDER_MB,
+        help="Memory budget per spider used to size the default parallelism",
+    )
+    args = parser.parse_args()
+
+    requested = args.spiders.split(",") if args.spiders else [spider.value for spider in SpiderName]
+    names = [name for name in requested if is_registered(name)]
+    skipped = [name for name in requested if not is_registered(name)]
+    max_parallel = args.max_parallel or default_parallelism(args.memory_per_spider_mb)
+
+    runs = asyncio.run(run_all_spiders(names, max_parallel))
+    print_summary(runs, skipped)
+    sys.exit(0 if all(run.returncode == 0 for run in runs) else 1)
+
 
 if __name__ == "__main__":
-    run_all_spiders()
\ No newline at end of file
+    main()
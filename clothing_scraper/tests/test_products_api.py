@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+from psycopg2.extras import RealDictRow
+
+from api import main
+from api.cache import get_cache
+
+SCRAPED_AT = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def product_row(product_id):
+    # What get_products / get_product return: SELECT * rows, internal columns included
+    return RealDictRow(
+        id=product_id,
+        name=f"Chemise {product_id}",
+        description=None,
+        price=29.99,
+        sizes=["M", "L"],
+        colors=["Noir"],
+        image_urls=[],
+        product_link=f"https://example.com/p/{product_id}",
+        scraped_at=SCRAPED_AT,
+        content_hash="0" * 64,
+        search_vector="'chemis':1A",
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.db, "get_products", lambda skip, limit, **filters: [product_row(1), product_row(2)])
+    monkeypatch.setattr(main.db, "get_product", lambda product_id: product_row(product_id))
+    get_cache().invalidate()
+    return TestClient(main.app)
+
+
+def test_list_returns_product_fields(client):
+    response = client.get("/products/")
+    assert response.status_code == 200
+    products = response.json()
+    assert [product["id"] for product in products] == [1, 2]
+    assert products[0]["name"] == "Chemise 1"
+    assert products[0]["price"] == 29.99
+    assert products[0]["sizes"] == ["M", "L"]
+    assert products[0]["product_link"] == "https://example.com/p/1"
+    assert "content_hash" not in products[0]
+    assert "search_vector" not in products[0]
+
+
+def test_detail_returns_product_fields(client):
+    response = client.get("/products/7")
+    assert response.status_code == 200
+    product = response.json()
+    assert product["id"] == 7
+    assert product["name"] == "Chemise 7"
+    assert product["colors"] == ["Noir"]
+    assert "content_hash" not in product